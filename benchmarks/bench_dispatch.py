@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark: per-poll controls decode, original path vs dispatch table
+
+Usage: python3 benchmarks/bench_dispatch.py [--iterations N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kpod_bridge import TAP_NOTE_MAP, HOLD_NOTE_MAP
+from kpod_dispatch import build_dispatch_table
+
+
+def legacy_decode(controls, current_rocker="VFO B", ticks=0):
+    """The decode the poll loop used to run on every report."""
+    sent = []
+    has_activity = ticks != 0 or (controls & 0x0F) != 0
+
+    new_position = None
+    rocker_bits = (controls >> 5) & 0x03
+    if rocker_bits == 0b10:
+        new_position = "VFO A"
+    elif rocker_bits == 0b01:
+        new_position = "XIT/RIT"
+    elif controls == 0x00 and has_activity:
+        new_position = "VFO B"
+    elif controls == 0x00 and current_rocker not in ["VFO B", "UNKNOWN"]:
+        new_position = "VFO B"
+
+    button_bits = controls & 0x0F
+    if button_bits != 0:
+        tap_hold = "HOLD" if (controls & 0x10) else "TAP"
+        for i in range(8):
+            if button_bits & (1 << i):
+                if tap_hold == "TAP" and (0x40 | button_bits) in TAP_NOTE_MAP:
+                    note = TAP_NOTE_MAP[0x40 | button_bits]
+                elif tap_hold == "HOLD" and (0x50 | button_bits) in HOLD_NOTE_MAP:
+                    note = HOLD_NOTE_MAP[0x50 | button_bits]
+                else:
+                    base_note = 64 if tap_hold == "TAP" else 72
+                    note = base_note + i
+                sent.append([0x90, note, 127])
+                sent.append([0x80, note, 0])
+                break
+    return new_position, sent
+
+
+def table_decode(table, controls, current_rocker="VFO B", ticks=0):
+    """The same decode through the precomputed dispatch table."""
+    entry = table[controls]
+    has_activity = ticks != 0 or entry.button_bits != 0
+
+    new_position = entry.rocker
+    if new_position is None and controls == 0x00:
+        if has_activity or current_rocker not in ["VFO B", "UNKNOWN"]:
+            new_position = "VFO B"
+    return new_position, entry.messages
+
+
+def check_equivalence(table):
+    """Both paths must agree on every controls byte."""
+    for controls in range(256):
+        for rocker in ("VFO A", "VFO B", "XIT/RIT", "UNKNOWN"):
+            for ticks in (0, 3):
+                old_pos, old_msgs = legacy_decode(controls, rocker, ticks)
+                new_pos, new_msgs = table_decode(table, controls, rocker, ticks)
+                if old_pos != new_pos or [list(m) for m in new_msgs] != old_msgs:
+                    raise AssertionError(f"Mismatch for controls 0x{controls:02x} at {rocker}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    table = build_dispatch_table(TAP_NOTE_MAP, HOLD_NOTE_MAP)
+    check_equivalence(table)
+
+    # Realistic mix: mostly rocker-only bytes, some button events
+    rng = random.Random(args.seed)
+    samples = [rng.choice((0x00, 0x20, 0x40)) | (rng.randint(1, 8) if rng.random() < 0.3 else 0)
+               | (0x10 if rng.random() < 0.1 else 0)
+               for _ in range(1024)]
+
+    def run_legacy():
+        for controls in samples:
+            legacy_decode(controls)
+
+    def run_table():
+        for controls in samples:
+            table_decode(table, controls)
+
+    loops = max(1, args.iterations // len(samples))
+    results = {}
+    for name, func in (("legacy", run_legacy), ("table", run_table)):
+        best = min(timeit.repeat(func, number=loops, repeat=5))
+        results[name] = best / (loops * len(samples)) * 1e9
+
+    print(f"{'path':<8} {'ns/report':>10}")
+    for name, ns in results.items():
+        print(f"{name:<8} {ns:>10.1f}")
+    print(f"speedup  {results['legacy'] / results['table']:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark suite for the KPOD to MIDI pipeline
+
+Drives KPODBridge with a simulated KPOD and a counting MIDI stand-in through
+fixed load scenarios and reports events/s, MIDI messages/s, CPU time,
+allocations and latency percentiles per scenario. Results can be saved as a
+JSON baseline and compared against a later run.
+
+Usage:
+    python3 benchmarks/bench_pipeline.py --save baseline.json
+    python3 benchmarks/bench_pipeline.py --compare baseline.json
+    python3 benchmarks/bench_pipeline.py --gui --scenario fast_spin
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kpod_bridge import KPODBridge
+from kpod_midi import ENCODER_MODES, ENCODER_MODE_NOTES
+from kpod_transport import (
+    SimulatedKPOD, EventGenerator, Idle, EncoderSpin, ButtonStorm, RockerFlips,
+)
+
+# Scenario name -> one pass of segments; passes loop for the run duration
+SCENARIOS = {
+    "idle": lambda: [Idle(1.0)],
+    "slow_tuning": lambda: [EncoderSpin(8, 1.0), EncoderSpin(-8, 1.0)],
+    "fast_spin": lambda: [EncoderSpin(600, 0.3), Idle(0.2), EncoderSpin(-600, 0.3), Idle(0.2)],
+    "button_storm": lambda: [ButtonStorm(50, 1.0, hold_ratio=0.3)],
+    "rocker_flapping": lambda: [RockerFlips(20, 1.0)],
+}
+
+# Metrics compared against a baseline: (path in result, True if higher is worse)
+COMPARED_METRICS = (
+    (("cpu_pct",), True),
+    (("latency", "total", "p50_us"), True),
+    (("latency", "total", "p99_us"), True),
+    (("latency", "poll", "p50_us"), True),
+    (("latency", "poll", "p99_us"), True),
+    (("alloc_peak_kib",), True),
+    (("events_per_s",), False),
+)
+
+# Samples a latency percentile needs before it can fail a comparison; a
+# p99 of a few dozen samples is close to the maximum and mostly noise.
+# Percentiles with fewer samples are still printed.
+MIN_SAMPLES = {"p50_us": 20, "p99_us": 1000}
+
+
+class NullMidiOut:
+    """MIDI output stand-in that only counts messages."""
+
+    def __init__(self):
+        self.messages = 0
+
+    def send_message(self, message):
+        self.messages += 1
+
+    def close_port(self):
+        pass
+
+
+def run_bridge(bridge, duration, gui):
+    """Run the bridge for duration seconds, optionally under the Tk GUI."""
+    if gui:
+        from gui_main import KPODBridgeGUI
+        app = KPODBridgeGUI(bridge)
+        app.start_kpod()
+        app.root.after(int(duration * 1000), app.root.quit)
+        app.root.mainloop()
+        bridge.close()
+        app.root.destroy()
+    else:
+        bridge.start()
+        time.sleep(duration)
+        bridge.close()
+
+
+def run_scenario(name, args, gui=False, trace_alloc=False):
+    """Run one scenario and return its result dict."""
+    generator = EventGenerator(SCENARIOS[name](), loop=True)
+    transport = SimulatedKPOD(generator, response_delay=args.response_delay)
+    midi_out = NullMidiOut()
+    bridge = KPODBridge(transport, encoder_mode=args.encoder_mode, midi_out=midi_out)
+
+    if trace_alloc:
+        tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    run_bridge(bridge, args.duration, gui)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    result = {}
+    if trace_alloc:
+        result["alloc_peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+        result["alloc_blocks"] = sys.getallocatedblocks() - blocks_before
+        tracemalloc.stop()
+        return result
+
+    stats = bridge.stats
+    result.update({
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "cpu_pct": round(100.0 * cpu / wall, 1),
+        "polls_per_s": round(stats.polls / wall, 1),
+        "events_per_s": round(stats.events / wall, 1),
+        "midi_messages_per_s": round(midi_out.messages / wall, 1),
+        "ticks_generated": generator.ticks_generated,
+        "buttons_generated": generator.buttons_generated,
+        "errors": stats.errors,
+        "midi_drops": stats.midi_drops,
+        "midi_merges": stats.midi_merges,
+        "midi_queue_max": stats.midi_queue_max,
+        "latency": {stage: stats.histograms[stage].summary() for stage in ("poll", "decode", "midi", "total")},
+    })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def lookup(result, path):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Print metric changes against a baseline; return the number of regressions."""
+    regressions = 0
+    for key, result in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(key)
+        if not base:
+            print(f"{key}: not in baseline")
+            continue
+        for path, higher_is_worse in COMPARED_METRICS:
+            new, old = lookup(result, path), lookup(base, path)
+            if new is None or old is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            flag = "  REGRESSION" if worse else ""
+            if path[-1] in MIN_SAMPLES:
+                samples = min(lookup(result, path[:-1] + ("count",)) or 0,
+                              lookup(base, path[:-1] + ("count",)) or 0)
+                if samples < MIN_SAMPLES[path[-1]]:
+                    worse = False
+                    flag = f"  (only {samples} samples, not gated)"
+            regressions += worse
+            print(f"{key:<24} {'.'.join(path):<22} {old:>10} -> {new:>10} ({change:+.0%}){flag}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'scenario':<24} {'events/s':>9} {'msgs/s':>9} {'cpu%':>6} {'poll p50':>9} "
+          f"{'total p50':>10} {'total p99':>10} {'peak KiB':>9}")
+    for key, r in results["scenarios"].items():
+        latency = r["latency"]
+        print(f"{key:<24} {r['events_per_s']:>9} {r['midi_messages_per_s']:>9} {r['cpu_pct']:>6} "
+              f"{latency['poll']['p50_us']:>9} {latency['total']['p50_us']:>10} "
+              f"{latency['total']['p99_us']:>10} {r.get('alloc_peak_kib', '-'):>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KPOD to MIDI pipeline benchmarks")
+    parser.add_argument("--scenario", action="append", choices=tuple(SCENARIOS),
+                        help="scenario to run (repeatable, default all)")
+    parser.add_argument("--duration", type=float, default=3.0,
+                        help="seconds per scenario (default 3)")
+    parser.add_argument("--response-delay", type=float, default=0.001,
+                        help="simulated KPOD reply time in seconds (default 0.001)")
+    parser.add_argument("--encoder-mode", choices=ENCODER_MODES, default=ENCODER_MODE_NOTES)
+    parser.add_argument("--gui", action="store_true",
+                        help="also run every scenario with the Tk GUI attached")
+    parser.add_argument("--no-alloc", action="store_true",
+                        help="skip the separate tracemalloc pass")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative change counted as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    modes = [False, True] if args.gui else [False]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration_s": args.duration,
+            "response_delay_s": args.response_delay,
+            "encoder_mode": args.encoder_mode,
+        },
+        "scenarios": {},
+    }
+
+    for name in args.scenario or SCENARIOS:
+        for gui in modes:
+            key = f"{name}+gui" if gui else name
+            print(f"running {key} ...", file=sys.stderr)
+            try:
+                result = run_scenario(name, args, gui)
+                if not args.no_alloc:
+                    result.update(run_scenario(name, args, gui, trace_alloc=True))
+            except Exception as e:  # e.g. no display for the GUI runs
+                print(f"{key}: skipped ({e})", file=sys.stderr)
+                continue
+            results["scenarios"][key] = result
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,68 +6,63 @@ Enhanced with Tkinter GUI interface and proper rocker position detection
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext
-import hid
-import struct
+from tkinter import ttk, scrolledtext, filedialog
 import time
-import rtmidi
-import sys
-import threading
-import queue
-from datetime import datetime
+from collections import deque
 
-# KPOD USB identifiers
-VENDOR_ID = 0x04d8
-PRODUCT_ID = 0xF12D
-KPOD_USB_CMD_UPDATE = ord('u')
-REPORT_LEN = 8
+from kpod_bridge import KPODBridge
+from kpod_log import LEVELS
+from kpod_midi import ENCODER_MODES
+from kpod_stats import STAGES, PERCENTILES
 
-# TAP buttons: flags 0x41–0x48
-TAP_NOTE_MAP = {
-    0x41: 64, 0x42: 65, 0x43: 66, 0x44: 67,
-    0x45: 68, 0x46: 69, 0x47: 70, 0x48: 71,
-}
+# Steady GUI refresh rate and per-frame work budget
+FRAME_INTERVAL_MS = 50
+LOG_RECORDS_PER_FRAME = 100
 
-# HOLD buttons: flags 0x51–0x58
-HOLD_NOTE_MAP = {
-    0x51: 72, 0x52: 73, 0x53: 74, 0x54: 75,
-    0x55: 76, 0x56: 77, 0x57: 78, 0x58: 79,
-}
+# Latency panel refresh, in frames
+STATS_EVERY_FRAMES = 10
 
-# Rocker position change MIDI notes (unique button-like events)
-ROCKER_POSITION_NOTES = {
-    "VFO A": 110,      # Switch to VFO A mode
-    "VFO B": 111,      # Switch to VFO B mode  
-    "XIT/RIT": 112,    # Switch to XIT/RIT mode
-}
-
-# Encoder always sends the same notes regardless of rocker position
-ENCODER_NOTES = {
-    "CW": 100,         # Always clockwise = 100
-    "CCW": 101,        # Always counter-clockwise = 101
-}
+# Encoder rate sparkline: one sample per frame
+SPARKLINE_SAMPLES = 100
+SPARKLINE_WIDTH = 200
+SPARKLINE_HEIGHT = 30
 
 class KPODBridgeGUI:
-    def __init__(self):
+    """Tk front end observing a KPODBridge engine, or a KPODGroup of them."""
+
+    def __init__(self, bridge=None, auto_start=False):
         self.root = tk.Tk()
         self.root.title("KPOD to MIDI Bridge v2")
-        self.root.geometry("800x600")
+        self.root.geometry("800x720")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # State variables
-        self.midi_out = None
-        self.device = None
-        self.current_rocker = "UNKNOWN"  # Track position: VFO A, VFO B, XIT/RIT, UNKNOWN
-        self.running = False
-        self.kpod_thread = None
+        # Bridge engine; the GUI only reads its state snapshot and log.
+        # With several KPODs the main panels follow the first device.
+        self.engine = bridge or KPODBridge()
+        self.devices = list(getattr(self.engine, "bridges", [self.engine]))
+        self.bridge = self.devices[0]
+        self.device_events = {}  # name -> (time, events) at the last stats refresh
+        self.auto_start = auto_start
+        
+        # Values currently shown, so widgets are only touched on change
+        self.shown = {}
+        
+        # Counter samples for the events/s meter and encoder sparkline
+        self.last_frame = None
+        self.event_window = deque()  # (time, events) over the last second
+        self.encoder_rates = deque([0.0] * SPARKLINE_SAMPLES, maxlen=SPARKLINE_SAMPLES)
+        self.frame_count = 0
         
-        # Message queue for thread communication
-        self.message_queue = queue.Queue()
+        # Activity log display position: last record shown, its repeat count,
+        # and the number of lines in the text widget
+        self.log_seq = -1
+        self.log_count = 0
+        self.log_lines = 0
         
         self.setup_gui()
         
-        # Delay MIDI setup to ensure GUI is ready
-        self.root.after(500, self.delayed_midi_setup)
+        # Set up MIDI as soon as the window has been drawn
+        self.root.after_idle(self.delayed_midi_setup)
         self.start_processing()
     
     def setup_gui(self):
@@ -80,7 +75,7 @@ class KPODBridgeGUI:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(3, weight=1)
+        main_frame.rowconfigure(4, weight=1)
         
         # Title
         title_label = ttk.Label(main_frame, text="KPOD to MIDI Bridge v2", 
@@ -102,6 +97,15 @@ class KPODBridgeGUI:
         self.midi_status = ttk.Label(status_frame, text="Disconnected", foreground="red")
         self.midi_status.grid(row=1, column=1, sticky=tk.W)
         
+        # Effective poll rate
+        ttk.Label(status_frame, text="Poll Rate:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10))
+        self.poll_status = ttk.Label(status_frame, text="-")
+        self.poll_status.grid(row=2, column=1, sticky=tk.W)
+        
+        # Per-device status when several KPODs are bridged
+        if len(self.devices) > 1:
+            self.setup_device_table(status_frame)
+        
         # Current State Section
         state_frame = ttk.LabelFrame(main_frame, text="Current State", padding="10")
         state_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -117,9 +121,41 @@ class KPODBridgeGUI:
         self.last_action = ttk.Label(state_frame, text="None")
         self.last_action.grid(row=1, column=1, sticky=tk.W)
         
+        # Encoder output mode
+        ttk.Label(state_frame, text="Encoder Output:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10))
+        self.encoder_mode = tk.StringVar(value=self.bridge.encoder_mode)
+        encoder_combo = ttk.Combobox(state_frame, textvariable=self.encoder_mode,
+                                     values=ENCODER_MODES, state="readonly", width=12)
+        encoder_combo.grid(row=2, column=1, sticky=tk.W)
+        encoder_combo.bind("<<ComboboxSelected>>", self.on_encoder_mode)
+        
+        # Event rate meter
+        ttk.Label(state_frame, text="Events/s:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10))
+        self.events_label = ttk.Label(state_frame, text="0")
+        self.events_label.grid(row=3, column=1, sticky=tk.W)
+        
+        # Encoder rate sparkline
+        ttk.Label(state_frame, text="Encoder Rate:").grid(row=4, column=0, sticky=tk.W, padx=(0, 10))
+        rate_frame = ttk.Frame(state_frame)
+        rate_frame.grid(row=4, column=1, sticky=tk.W)
+        self.sparkline = tk.Canvas(rate_frame, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT,
+                                   highlightthickness=0, background="white")
+        self.sparkline.pack(side=tk.LEFT)
+        self.sparkline_line = self.sparkline.create_line(0, SPARKLINE_HEIGHT, SPARKLINE_WIDTH,
+                                                         SPARKLINE_HEIGHT, fill="blue")
+        self.encoder_rate_label = ttk.Label(rate_frame, text="0 ticks/s")
+        self.encoder_rate_label.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Pipeline Latency Section
+        title = "Pipeline Latency" if len(self.devices) == 1 else f"Pipeline Latency ({self.bridge.name})"
+        stats_frame = ttk.LabelFrame(main_frame, text=title, padding="10")
+        stats_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.stats_label = ttk.Label(stats_frame, text="No data", font=("Courier", 10), justify=tk.LEFT)
+        self.stats_label.grid(row=0, column=0, sticky=tk.W)
+        
         # Activity Log
         log_frame = ttk.LabelFrame(main_frame, text="Activity Log", padding="10")
-        log_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        log_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         log_frame.columnconfigure(0, weight=1)
         log_frame.rowconfigure(0, weight=1)
         
@@ -129,7 +165,7 @@ class KPODBridgeGUI:
         
         # Control buttons
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=4, column=0, columnspan=2, pady=(10, 0))
+        button_frame.grid(row=5, column=0, columnspan=2, pady=(10, 0))
         
         self.start_button = ttk.Button(button_frame, text="Start", command=self.start_kpod)
         self.start_button.pack(side=tk.LEFT, padx=(0, 10))
@@ -140,346 +176,251 @@ class KPODBridgeGUI:
         self.clear_button = ttk.Button(button_frame, text="Clear Log", command=self.clear_log)
         self.clear_button.pack(side=tk.LEFT, padx=(0, 10))
         
+        # Log level filter
+        ttk.Label(button_frame, text="Log Level:").pack(side=tk.LEFT, padx=(0, 5))
+        self.log_level = tk.StringVar(value="INFO")
+        level_combo = ttk.Combobox(button_frame, textvariable=self.log_level,
+                                   values=tuple(LEVELS), state="readonly", width=8)
+        level_combo.pack(side=tk.LEFT, padx=(0, 10))
+        level_combo.bind("<<ComboboxSelected>>", self.on_log_level)
+        
+        ttk.Button(button_frame, text="Profile...", command=self.load_profile).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Save Stats...", command=self.save_stats).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="Reset Stats", command=self.reset_stats).pack(side=tk.LEFT, padx=(0, 10))
+        
         ttk.Button(button_frame, text="Quit", command=self.on_closing).pack(side=tk.RIGHT)
     
-    def log_message(self, message, level="INFO"):
-        """Add a message to the log with timestamp."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {level}: {message}\n"
-        self.message_queue.put(("LOG", log_entry))
-    
-    def update_status(self, component, status, color="black"):
-        """Update connection status."""
-        self.message_queue.put(("STATUS", component, status, color))
+    def setup_device_table(self, parent):
+        """One row per KPOD: status, rocker, MIDI target, events/s and latency."""
+        table = ttk.Frame(parent)
+        table.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        headings = ("Device", "KPOD", "Rocker", "MIDI", "Events/s", "Total p99 (µs)")
+        for column, heading in enumerate(headings):
+            ttk.Label(table, text=heading, font=("Arial", 10, "bold")).grid(
+                row=0, column=column, sticky=tk.W, padx=(0, 15))
+        self.device_rows = []
+        for row, device in enumerate(self.devices, start=1):
+            ttk.Label(table, text=device.name).grid(row=row, column=0, sticky=tk.W, padx=(0, 15))
+            labels = []
+            for column in range(1, len(headings)):
+                label = ttk.Label(table, text="-")
+                label.grid(row=row, column=column, sticky=tk.W, padx=(0, 15))
+                labels.append(label)
+            self.device_rows.append(labels)
     
-    def update_last_action(self, action):
-        """Update last action display."""
-        self.message_queue.put(("ACTION", action))
-    
-    def setup_midi(self):
-        """Initialize MIDI output connection."""
-        try:
-            # Ensure we're on the main thread for MIDI initialization
-            if threading.current_thread() != threading.main_thread():
-                self.log_message("MIDI setup must be on main thread", "ERROR")
-                return False
-            
-            self.midi_out = rtmidi.MidiOut()
-            
-            # Small delay to ensure MIDI system is ready
-            time.sleep(0.1)
-            
-            ports = self.midi_out.get_ports()
-            self.log_message(f"Available MIDI ports: {ports}")
-            
-            iac_port_index = next((i for i, p in enumerate(ports) if "IAC" in p), None)
-            
-            if iac_port_index is None:
-                self.log_message("IAC Driver not found. Please enable it in Audio MIDI Setup.", "ERROR")
-                self.update_status("MIDI", "IAC Driver not found", "red")
-                return False
-            
-            self.midi_out.open_port(iac_port_index)
-            port_name = ports[iac_port_index]
-            self.log_message(f"Connected to MIDI: {port_name}")
-            self.update_status("MIDI", f"Connected: {port_name}", "green")
-            return True
+    def refresh_devices(self):
+        """Update the per-device rows."""
+        now = time.monotonic()
+        for device, (kpod, rocker, midi, events, latency) in zip(self.devices, self.device_rows):
+            state = device.state
+            key = device.name
+            self.show(key + ":kpod", kpod, *state.status["KPOD"])
+            self.show(key + ":rocker", rocker, state.rocker.split(" (")[0])
+            port = f" {state.midi_port}" if state.midi_port else ""
+            self.show(key + ":midi", midi, f"ch {device.midi_channel + 1}{port}",
+                      state.status["MIDI"][1])
             
-        except Exception as e:
-            self.log_message(f"MIDI setup failed: {e}", "ERROR")
-            self.update_status("MIDI", f"Error: {e}", "red")
-            # Clean up on error
-            if hasattr(self, 'midi_out') and self.midi_out:
-                try:
-                    self.midi_out.close_port()
-                except:
-                    pass
-                self.midi_out = None
-            return False
-    
-    def send_kpod_command(self, cmd_char, data=None):
-        """Send a command to KPOD and read response."""
-        if not self.device:
-            return None
-            
-        try:
-            if data is None:
-                data = [0] * 7
-            
-            # Ensure data is exactly 7 bytes
-            cmd_data = data[:7] + [0] * (7 - len(data))
-            
-            # Create command packet
-            pkt = bytes([ord(cmd_char)] + cmd_data)
-            self.device.write(pkt)
-            
-            # Read response
-            response = self.device.read(REPORT_LEN)
-            return response
-        except Exception as e:
-            self.log_message(f"Command '{cmd_char}' failed: {e}", "ERROR")
-            return None
-    
-    def detect_rocker_position_from_event(self, controls, has_activity):
-        """
-        Detect rocker position from event data.
-        Returns new position string or None if no change.
-        """
-        new_position = None
-        
-        # Extract rocker bits according to API spec
-        rocker_bits = (controls >> 5) & 0x03
-        
-        if rocker_bits == 0b10:  # Left rocker (VFO A)
-            new_position = "VFO A"
-        elif rocker_bits == 0b01:  # Right rocker (XIT/RIT)
-            new_position = "XIT/RIT"
-        elif controls == 0x00 and has_activity:
-            # Controls = 0x00 with encoder/button activity = VFO B (center)
-            new_position = "VFO B"
-        elif controls == 0x00 and self.current_rocker not in ["VFO B", "UNKNOWN"]:
-            # Transition to center from A or XIT/RIT
-            new_position = "VFO B"
-        
-        return new_position
-    
-    def send_rocker_position_change(self, new_position):
-        """Send MIDI note for rocker position change."""
-        if new_position in ROCKER_POSITION_NOTES:
-            note = ROCKER_POSITION_NOTES[new_position]
-            self.send_note(note)
-            action = f"Rocker → {new_position} (MIDI Note {note})"
-            self.log_message(action)
-            self.update_last_action(action)
-            return True
-        return False
+            count = device.stats.events
+            last = self.device_events.get(key)
+            if last is not None and now > last[0]:
+                self.show(key + ":events", events, f"{(count - last[1]) / (now - last[0]):.0f}")
+            self.device_events[key] = (now, count)
+            p99 = device.stats.histograms["total"].summary()["p99_us"]
+            self.show(key + ":latency", latency, f"{p99:.1f}")
     
-    def get_device_info(self):
-        """Get KPOD device ID and firmware version."""
-        try:
-            # Get Device ID
-            id_response = self.send_kpod_command('=')
-            if id_response and len(id_response) >= 8:
-                id_string = ''.join(chr(b) for b in id_response[1:8] if b != 0)
-                self.log_message(f"Device ID: {id_string}")
-            
-            # Get Firmware Version  
-            ver_response = self.send_kpod_command('v')
-            if ver_response and len(ver_response) >= 3:
-                version_bcd = struct.unpack("<h", bytes(ver_response[1:3]))[0]
-                # Convert BCD to version string (e.g., 108 -> "1.08")
-                major = version_bcd // 100
-                minor = version_bcd % 100
-                version_str = f"{major}.{minor:02d}"
-                self.log_message(f"Firmware Version: {version_str}")
-            
-        except Exception as e:
-            self.log_message(f"Failed to get device info: {e}", "ERROR")
+    def log_message(self, message, level="INFO"):
+        """Add a message to the log with timestamp."""
+        self.engine.log_message(message, level)
     
-    def setup_hid(self):
-        """Initialize HID device connection and get device info."""
-        try:
-            self.device = hid.Device(VENDOR_ID, PRODUCT_ID)
-            self.device.nonblocking = False
-            self.log_message("Connected to KPOD")
-            self.update_status("KPOD", "Connected", "green")
-            
-            # Get device information
-            self.get_device_info()
-            
-            return True
-        except Exception as e:
-            self.log_message(f"Could not open KPOD: {e}", "ERROR")
-            self.update_status("KPOD", f"Error: {e}", "red")
-            return False
+    def on_encoder_mode(self, event=None):
+        """Switch the encoder output mode of every device."""
+        for device in self.devices:
+            device.encoder_mode = self.encoder_mode.get()
+        self.log_message(f"Encoder output mode: {self.encoder_mode.get()}")
     
     def delayed_midi_setup(self):
-        """Setup MIDI after GUI is fully initialized."""
-        self.setup_midi()
-    
-    def update_rocker_display(self, position):
-        """Update rocker position display."""
-        display_names = {
-            "VFO A": "VFO A (Left)",
-            "VFO B": "VFO B (Center)",
-            "XIT/RIT": "XIT/RIT (Right)",
-            "UNKNOWN": "Unknown (move rocker to detect)"
-        }
-        display_name = display_names.get(position, position)
-        self.message_queue.put(("ROCKER", display_name))
-    
-    def send_note(self, note, velocity=127):
-        """Send MIDI Note On followed by Note Off."""
-        try:
-            if self.midi_out:
-                self.midi_out.send_message([0x90, note, velocity])
-                self.midi_out.send_message([0x80, note, 0])
-        except Exception as e:
-            self.log_message(f"MIDI send error: {e}", "ERROR")
-    
-    def get_encoder_notes(self):
-        """Get encoder MIDI notes based on rocker position."""
-        if self.current_rocker == "XIT/RIT":
-            # XIT/RIT mode uses different encoder notes
-            return (102, 103)  # CW=102, CCW=103
-        else:
-            # VFO A and VFO B both use standard encoder notes
-            return (ENCODER_NOTES["CW"], ENCODER_NOTES["CCW"])  # CW=100, CCW=101
-    
-    def kpod_worker(self):
-        """Worker thread for KPOD communication."""
-        if not self.setup_hid():
-            return
-        
-        self.log_message("KPOD monitoring started")
-        
-        try:
-            while self.running:
-                # Send update request to KPOD using event-based approach
-                response = self.send_kpod_command('u')
-                
-                if response and len(response) == 8:
-                    cmd_reply = response[0]
-                    ticks = struct.unpack("<h", bytes(response[1:3]))[0]
-                    controls = response[3]
-                    
-                    # Only process if there's a new event
-                    if cmd_reply == ord('u'):
-                        has_activity = ticks != 0 or (controls & 0x0F) != 0
-                        
-                        # Detect rocker position changes
-                        new_position = self.detect_rocker_position_from_event(controls, has_activity)
-                        if new_position and new_position != self.current_rocker:
-                            # Send MIDI note for rocker position change
-                            self.send_rocker_position_change(new_position)
-                            self.current_rocker = new_position
-                            self.update_rocker_display(new_position)
-                        
-                        # Handle encoder - position-dependent notes
-                        # VFO A/B: 100/101, XIT/RIT: 102/103
-                        cw_note, ccw_note = self.get_encoder_notes()
-                        
-                        if ticks > 0:
-                            for _ in range(ticks):
-                                self.send_note(cw_note)
-                                action = f"Encoder CW → Note {cw_note} (at {self.current_rocker})"
-                                self.log_message(action)
-                                self.update_last_action(action)
-                        elif ticks < 0:
-                            for _ in range(abs(ticks)):
-                                self.send_note(ccw_note)
-                                action = f"Encoder CCW → Note {ccw_note} (at {self.current_rocker})"
-                                self.log_message(action)
-                                self.update_last_action(action)
-                        
-                        # Handle buttons (using corrected bit mapping)
-                        button_bits = controls & 0x0F
-                        if button_bits != 0:
-                            tap_hold = "HOLD" if (controls & 0x10) else "TAP"
-                            
-                            # Find which button was pressed
-                            for i in range(8):  # Buttons 1-8
-                                if button_bits & (1 << i):
-                                    button_num = i + 1
-                                    
-                                    # Use correct note mapping
-                                    if tap_hold == "TAP" and (0x40 | button_bits) in TAP_NOTE_MAP:
-                                        note = TAP_NOTE_MAP[0x40 | button_bits]
-                                    elif tap_hold == "HOLD" and (0x50 | button_bits) in HOLD_NOTE_MAP:
-                                        note = HOLD_NOTE_MAP[0x50 | button_bits]
-                                    else:
-                                        # Fallback mapping
-                                        base_note = 64 if tap_hold == "TAP" else 72
-                                        note = base_note + i
-                                    
-                                    self.send_note(note)
-                                    action = f"{tap_hold} Button {button_num} → Note {note}"
-                                    self.log_message(action)
-                                    self.update_last_action(action)
-                                    break
-                
-                time.sleep(0.01)  # Faster polling for better responsiveness
-        
-        except Exception as e:
-            self.log_message(f"KPOD worker error: {e}", "ERROR")
-        finally:
-            self.cleanup_hid()
-            self.log_message("KPOD monitoring stopped")
+        """Setup MIDI after GUI is fully initialized, then auto-start if asked."""
+        if self.bridge.startup:
+            self.bridge.startup.mark("window shown")
+        self.engine.setup_midi()
+        if self.auto_start:
+            self.start_kpod()
     
     def start_kpod(self):
         """Start KPOD monitoring."""
-        if not self.running:
-            self.running = True
-            self.kpod_thread = threading.Thread(target=self.kpod_worker, daemon=True)
-            self.kpod_thread.start()
+        if self.engine.start():
             self.start_button.config(state=tk.DISABLED)
             self.stop_button.config(state=tk.NORMAL)
-            self.log_message("Starting KPOD monitoring...")
     
     def stop_kpod(self):
         """Stop KPOD monitoring."""
-        if self.running:
-            self.running = False
+        if self.engine.stop():
             self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
-            self.update_status("KPOD", "Disconnected", "red")
-            self.log_message("Stopping KPOD monitoring...")
+    
+    def on_log_level(self, event=None):
+        """Change the lowest level kept in the activity log."""
+        self.bridge.activity_log.set_level(self.log_level.get())
     
     def clear_log(self):
         """Clear the activity log."""
         self.log_text.delete(1.0, tk.END)
+        self.log_lines = 0
+    
+    def refresh_log(self):
+        """Show new activity log records, trimming the widget to the log capacity."""
+        activity_log = self.bridge.activity_log
+        changed = False
+        
+        # The last shown record may have collected more repeats; rewrite its line
+        shown = activity_log.get(self.log_seq)
+        if shown is not None and self.log_lines:
+            count = shown.count
+            if count != self.log_count:
+                line = self.log_lines
+                self.log_text.delete(f"{line}.0", f"{line + 1}.0")
+                self.log_text.insert(f"{line}.0", shown.format(count))
+                self.log_count = count
+                changed = True
+        
+        records = activity_log.since(self.log_seq)
+        if records:
+            # Stay current under load: show only the newest records this frame
+            text = ""
+            skipped = len(records) - LOG_RECORDS_PER_FRAME
+            if skipped > 0:
+                records = records[skipped:]
+                text = f"... {skipped} records not shown\n"
+                self.log_lines += 1
+            last = records[-1]
+            count = last.count
+            text += "".join(r.format() for r in records[:-1]) + last.format(count)
+            self.log_text.insert(tk.END, text)
+            self.log_lines += len(records)
+            self.log_seq = last.seq
+            self.log_count = count
+            changed = True
+            
+            excess = self.log_lines - activity_log.capacity
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+                self.log_lines -= excess
+        
+        if changed:
+            self.log_text.see(tk.END)
+    
+    def load_profile(self):
+        """Ask for a mapping profile and watch it for changes."""
+        path = filedialog.askopenfilename(
+            title="Load Mapping Profile",
+            filetypes=[("Profiles", "*.json *.toml"), ("All files", "*")])
+        if path:
+            self.engine.watch_profile(path)
+    
+    def save_stats(self):
+        """Ask for a file name and write the pipeline statistics."""
+        path = filedialog.asksaveasfilename(
+            title="Save Statistics", defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if path:
+            self.engine.dump_stats(path)
     
-    def cleanup_hid(self):
-        """Clean up HID resources."""
-        if self.device:
-            try:
-                self.device.close()
-                self.device = None
-            except:
-                pass
+    def reset_stats(self):
+        """Clear latency histograms and counters."""
+        for device in self.devices:
+            device.stats.reset()
+        self.event_window.clear()
+        self.device_events.clear()
+        self.log_message("Statistics reset")
     
-    def cleanup_midi(self):
-        """Clean up MIDI resources."""
-        if self.midi_out:
-            try:
-                self.midi_out.close_port()
-                self.midi_out = None
-            except:
-                pass
+    def format_stats(self):
+        """Latency table and counters as fixed-width text."""
+        stats = self.bridge.stats
+        header = f"{'stage':<8}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'max':>10}   (µs)"
+        lines = [header]
+        for stage in STAGES:
+            summary = stats.histograms[stage].summary()
+            if not summary["count"] or stage == "recover":
+                continue
+            lines.append(f"{stage:<8}"
+                         + "".join(f"{summary[f'p{p}_us']:>10.1f}" for p in PERCENTILES)
+                         + f"{summary['max_us']:>10.1f}")
+        lines.append(f"polls {stats.polls}  events {stats.events}  empty {stats.empty_polls}  "
+                     f"errors {stats.errors}  midi {stats.midi_messages}")
+        lines.append(f"MIDI queue {self.bridge.midi_sender.depth} (max {stats.midi_queue_max})  "
+                     f"drops {stats.midi_drops}  merges {stats.midi_merges}")
+        if stats.disconnects or stats.hid_timeouts:
+            recover_max = stats.histograms["recover"].max_ns / 1e9
+            lines.append(f"disconnects {stats.disconnects}  reconnects {stats.reconnects} "
+                         f"(max {recover_max:.2f} s)  timeouts {stats.hid_timeouts}")
+        return "\n".join(lines)
+    
+    def show(self, key, widget, text, color=None):
+        """Configure a widget only when its text or color changed."""
+        value = (text, color)
+        if self.shown.get(key) != value:
+            self.shown[key] = value
+            if color is None:
+                widget.config(text=text)
+            else:
+                widget.config(text=text, foreground=color)
+    
+    def update_rates(self, state):
+        """Update the events/s meter and encoder sparkline from counter deltas."""
+        now = time.monotonic()
+        events, ticks = self.bridge.stats.events, state.encoder_ticks
+        
+        window = self.event_window
+        window.append((now, events))
+        while now - window[0][0] > 1.0:
+            window.popleft()
+        span = now - window[0][0]
+        events_per_second = (events - window[0][1]) / span if span > 0 else 0.0
+        self.show("events", self.events_label, f"{events_per_second:.0f}")
+        
+        if self.last_frame is not None:
+            last_time, last_ticks = self.last_frame
+            dt = now - last_time
+            self.encoder_rates.append((ticks - last_ticks) / dt if dt > 0 else 0.0)
+        self.last_frame = (now, ticks)
+        
+        rate = self.encoder_rates[-1]
+        self.show("encoder_rate", self.encoder_rate_label, f"{rate:.0f} ticks/s")
+        
+        peak = max(self.encoder_rates)
+        if peak > 0 or self.shown.get("sparkline"):
+            scale = (SPARKLINE_HEIGHT - 2) / peak if peak > 0 else 0.0
+            step = SPARKLINE_WIDTH / (SPARKLINE_SAMPLES - 1)
+            coords = []
+            for i, value in enumerate(self.encoder_rates):
+                coords.append(i * step)
+                coords.append(SPARKLINE_HEIGHT - 1 - value * scale)
+            self.sparkline.coords(self.sparkline_line, *coords)
+            self.shown["sparkline"] = peak > 0
     
     def process_messages(self):
-        """Process messages from the worker thread."""
-        try:
-            while True:
-                message = self.message_queue.get_nowait()
-                msg_type = message[0]
-                
-                if msg_type == "LOG":
-                    # Add to log text
-                    self.log_text.insert(tk.END, message[1])
-                    self.log_text.see(tk.END)
-                
-                elif msg_type == "STATUS":
-                    # Update status labels
-                    component, status, color = message[1], message[2], message[3]
-                    if component == "KPOD":
-                        self.kpod_status.config(text=status, foreground=color)
-                    elif component == "MIDI":
-                        self.midi_status.config(text=status, foreground=color)
-                
-                elif msg_type == "ROCKER":
-                    # Update rocker position
-                    self.rocker_label.config(text=message[1])
-                
-                elif msg_type == "ACTION":
-                    # Update last action
-                    self.last_action.config(text=message[1])
-                
-        except queue.Empty:
-            pass
-        
-        # Schedule next check
-        self.root.after(100, self.process_messages)
+        """Refresh the display from the bridge's latest state, once per frame."""
+        state = self.bridge.state
+        
+        # Only the newest value of each field is shown
+        status = state.status
+        self.show("KPOD", self.kpod_status, *status["KPOD"])
+        self.show("MIDI", self.midi_status, *status["MIDI"])
+        self.show("POLL", self.poll_status, *status["POLL"])
+        self.show("rocker", self.rocker_label, state.rocker)
+        self.show("action", self.last_action, state.last_action)
+        
+        self.update_rates(state)
+        self.refresh_log()
+        
+        self.frame_count += 1
+        if self.frame_count % STATS_EVERY_FRAMES == 0:
+            self.show("stats", self.stats_label, self.format_stats())
+            if len(self.devices) > 1:
+                self.refresh_devices()
+        
+        # Schedule next frame
+        self.root.after(FRAME_INTERVAL_MS, self.process_messages)
     
     def start_processing(self):
         """Start the message processing loop."""
@@ -487,11 +428,7 @@ class KPODBridgeGUI:
     
     def on_closing(self):
         """Handle window closing."""
-        self.running = False
-        if self.kpod_thread and self.kpod_thread.is_alive():
-            self.kpod_thread.join(timeout=1)
-        self.cleanup_hid()
-        self.cleanup_midi()
+        self.engine.close()
         self.root.destroy()
     
     def run(self):
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Encoder Acceleration
+Scale encoder ticks by spin rate so big moves need few events
+"""
+
+import math
+import time
+from collections import deque
+
+
+class LinearCurve:
+    """Gain grows linearly above a threshold rate (ticks/s)."""
+
+    def __init__(self, threshold=20.0, slope=0.05, max_gain=20.0):
+        self.threshold = threshold
+        self.slope = slope
+        self.max_gain = max_gain
+
+    def gain(self, rate):
+        return min(self.max_gain, 1.0 + self.slope * max(0.0, rate - self.threshold))
+
+
+class ExponentialCurve:
+    """Gain doubles every rate_scale ticks/s above a threshold rate."""
+
+    def __init__(self, threshold=20.0, rate_scale=40.0, max_gain=50.0):
+        self.threshold = threshold
+        self.rate_scale = rate_scale
+        self.max_gain = max_gain
+
+    def gain(self, rate):
+        if rate <= self.threshold:
+            return 1.0
+        return min(self.max_gain, math.pow(2.0, (rate - self.threshold) / self.rate_scale))
+
+
+class TableCurve:
+    """Gain interpolated linearly from (rate, gain) points, clamped at both ends."""
+
+    def __init__(self, points=((0.0, 1.0), (30.0, 1.0), (100.0, 4.0), (300.0, 20.0))):
+        self.points = sorted(points)
+        if not self.points:
+            raise ValueError("TableCurve needs at least one point")
+
+    def gain(self, rate):
+        points = self.points
+        if rate <= points[0][0]:
+            return points[0][1]
+        for (r0, g0), (r1, g1) in zip(points, points[1:]):
+            if rate <= r1:
+                return g0 + (g1 - g0) * (rate - r0) / (r1 - r0)
+        return points[-1][1]
+
+
+CURVES = {
+    "linear": LinearCurve,
+    "exponential": ExponentialCurve,
+    "table": TableCurve,
+}
+
+
+class AccelerationProfile:
+    """
+    Spin-rate tracker and curve for one rocker position.
+
+    The rate is the number of ticks seen over the last window seconds. The
+    fractional part of each scaled step count is carried to the next poll,
+    so slow turns still move exactly one step per tick.
+    """
+
+    def __init__(self, curve, window=0.15):
+        self.curve = curve
+        self.window = window
+        self.history = deque()  # (timestamp, abs ticks)
+        self.window_ticks = 0
+        self.direction = 0
+        self.remainder = 0.0
+
+    def reset(self):
+        self.history.clear()
+        self.window_ticks = 0
+        self.direction = 0
+        self.remainder = 0.0
+
+    def rate(self, now):
+        """Current spin rate in ticks/s."""
+        history = self.history
+        while history and now - history[0][0] > self.window:
+            self.window_ticks -= history.popleft()[1]
+        return self.window_ticks / self.window
+
+    def scale(self, ticks, now):
+        """Return the accelerated, signed step count for ticks."""
+        direction = 1 if ticks > 0 else -1
+        if direction != self.direction:
+            # Reversal means fine adjustment; start from single steps again
+            self.reset()
+            self.direction = direction
+
+        count = abs(ticks)
+        self.history.append((now, count))
+        self.window_ticks += count
+
+        steps = count * self.curve.gain(self.rate(now)) + self.remainder
+        whole = int(steps)
+        self.remainder = steps - whole
+        return direction * whole
+
+
+def default_profiles(curve_name="exponential"):
+    """Per-rocker profiles: the named curve on the VFOs, a gentle one on XIT/RIT."""
+    curve_class = CURVES[curve_name]
+    return {
+        "VFO A": AccelerationProfile(curve_class()),
+        "VFO B": AccelerationProfile(curve_class()),
+        "XIT/RIT": AccelerationProfile(LinearCurve(threshold=40.0, slope=0.02, max_gain=4.0)),
+    }
+
+
+class EncoderAccelerator:
+    """Apply the rocker position's acceleration profile to decoded ticks."""
+
+    def __init__(self, profiles=None, clock=time.monotonic):
+        self.profiles = profiles if profiles is not None else default_profiles()
+        # Unknown rocker position falls back to the VFO A profile
+        self.fallback = self.profiles.get("VFO A") or next(iter(self.profiles.values()))
+        self.clock = clock
+
+    def reset(self):
+        for profile in self.profiles.values():
+            profile.reset()
+
+    def scale(self, ticks, rocker, now=None):
+        """Return scaled steps for ticks at the given rocker position."""
+        if not ticks:
+            return 0
+        now = self.clock() if now is None else now
+        profile = self.profiles.get(rocker, self.fallback)
+        return profile.scale(ticks, now)
+
+    def rate(self, rocker, now=None):
+        """Current spin rate (ticks/s) seen by the rocker position's profile."""
+        now = self.clock() if now is None else now
+        return self.profiles.get(rocker, self.fallback).rate(now)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Capture Analysis
+Vectorized NumPy statistics over captured KPOD report streams
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from kpod_capture import HEADER, RECORD, CaptureError, CaptureReader
+from kpod_transport import KPOD_USB_CMD_UPDATE, ROCKER_BITS
+
+# numpy view of one kpod_capture.RECORD
+RECORD_DTYPE = np.dtype([("t_ns", "<i8"), ("round_trip_ns", "<u4"), ("report", "u1", 8)])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# Rocker bits (controls >> 5) & 3 -> index into ROCKER_NAMES
+ROCKER_NAMES = ("VFO A", "VFO B", "XIT/RIT")
+ROCKER_INDEX = np.full(4, -1, dtype=np.int8)
+for _index, _name in enumerate(ROCKER_NAMES):
+    ROCKER_INDEX[ROCKER_BITS[_name]] = _index
+
+# Decoded report columns
+EVENT_DTYPE = np.dtype([
+    ("session", "<u2"),       # Index of the capture file, in start order
+    ("t_ns", "<i8"),          # Read time, ns since the Unix epoch
+    ("round_trip_ns", "<u4"),
+    ("event", "?"),           # Reply carried an event ('u')
+    ("ticks", "<i2"),
+    ("rocker", "i1"),         # Index into ROCKER_NAMES, -1 if unknown
+    ("button", "u1"),         # 1-8, 0 = none
+    ("hold", "?"),
+])
+
+
+def load_capture(path):
+    """Map a capture file as a read-only structured array of raw records."""
+    reader = CaptureReader(path)  # Validates the header
+    started, count = reader.started, len(reader)
+    reader.close()
+    if not count:
+        return np.zeros(0, RECORD_DTYPE), started
+    return np.memmap(path, RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,)), started
+
+
+def decode(records, started=0.0, session=0):
+    """Decode raw records into EVENT_DTYPE columns without a Python-level loop."""
+    report = records["report"]
+    decoded = np.empty(len(records), EVENT_DTYPE)
+    decoded["session"] = session
+    decoded["t_ns"] = records["t_ns"] + np.int64(round(started * 1e9))
+    decoded["round_trip_ns"] = records["round_trip_ns"]
+    decoded["event"] = report[:, 0] == KPOD_USB_CMD_UPDATE
+    # Bytes 1-2 are a little-endian signed 16-bit tick count
+    decoded["ticks"] = (report[:, 1].astype(np.uint16) | (report[:, 2].astype(np.uint16) << 8)).view(np.int16)
+    controls = report[:, 3]
+    decoded["rocker"] = ROCKER_INDEX[(controls >> 5) & 3]
+    decoded["button"] = controls & 0x0F
+    decoded["hold"] = (controls & 0x10) != 0
+    # Empty polls carry no ticks, buttons or rocker
+    idle = ~decoded["event"]
+    decoded["ticks"][idle] = 0
+    decoded["button"][idle] = 0
+    decoded["hold"][idle] = False
+    return decoded
+
+
+def load_sessions(paths):
+    """
+    Decode and concatenate captures, one session per file in start order.
+    Sessions are kept apart rather than merged by time: the gaps between
+    them, or another device's reports, are not poll intervals or bursts.
+    """
+    captures = sorted((load_capture(path) for path in paths), key=lambda capture: capture[1])
+    parts = [decode(records, started, session)
+             for session, (records, started) in enumerate(captures)]
+    if not parts:
+        return np.zeros(0, EVENT_DTYPE)
+    decoded = np.concatenate(parts)
+    return decoded[np.lexsort((decoded["t_ns"], decoded["session"]))]
+
+
+def session_changes(decoded):
+    """Boolean per neighbouring pair: True where the second record starts a new session."""
+    return np.diff(decoded["session"].astype(np.int64)) != 0
+
+
+def session_spans(decoded):
+    """Seconds from first to last record, summed over sessions."""
+    if not len(decoded):
+        return 0.0
+    starts = np.flatnonzero(np.concatenate(([True], session_changes(decoded))))
+    ends = np.append(starts[1:], len(decoded)) - 1
+    return float((decoded["t_ns"][ends] - decoded["t_ns"][starts]).sum()) / 1e9
+
+
+def log2_histogram(values):
+    """{upper bound: count} over power-of-two bins, for positive values."""
+    values = values[values > 0]
+    if not len(values):
+        return {}
+    bins = np.ceil(np.log2(values)).astype(np.int64)
+    counts = np.bincount(bins - bins.min())
+    return {int(2 ** (b + bins.min())): int(n) for b, n in enumerate(counts) if n}
+
+
+def percentiles(values, points=(50, 95, 99)):
+    if not len(values):
+        return {f"p{p}": 0.0 for p in points} | {"max": 0.0}
+    result = dict(zip((f"p{p}" for p in points), np.percentile(values, points).round(3).tolist()))
+    result["max"] = float(np.max(values))
+    return result
+
+
+def tuning_rates(decoded, window=0.1):
+    """Encoder speed in ticks/s, measured over window-second bins that saw ticks."""
+    events = decoded[decoded["ticks"] != 0]
+    if not len(events):
+        return np.zeros(0)
+    window_ns = int(window * 1e9)
+    bins = (events["t_ns"] - events["t_ns"][0]) // window_ns
+    # A bin starts wherever the window or the session changes
+    first = np.flatnonzero(np.concatenate(([True], (np.diff(bins) != 0) | session_changes(events))))
+    ticks = np.add.reduceat(np.abs(events["ticks"].astype(np.int64)), first)
+    return ticks / window
+
+
+def button_usage(decoded):
+    """Counts per [rocker][button 1-8][tap, hold]; unknown rocker positions are skipped."""
+    pressed = decoded[(decoded["button"] >= 1) & (decoded["button"] <= 8) & (decoded["rocker"] >= 0)]
+    index = (pressed["rocker"].astype(np.int64) * 8 + (pressed["button"] - 1)) * 2 + pressed["hold"]
+    counts = np.bincount(index, minlength=len(ROCKER_NAMES) * 16)
+    return counts.reshape(len(ROCKER_NAMES), 8, 2)
+
+
+def bursts(decoded, gap=0.25):
+    """(ticks, events) per burst: event reports of one session no more than gap seconds apart."""
+    events = decoded[decoded["event"]]
+    if not len(events):
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    breaks = (np.diff(events["t_ns"]) > gap * 1e9) | session_changes(events)
+    burst_id = np.concatenate(([0], np.cumsum(breaks)))
+    ticks = np.bincount(burst_id, weights=np.abs(events["ticks"].astype(np.int64))).astype(np.int64)
+    return ticks, np.bincount(burst_id)
+
+
+def analyze(decoded, window=0.1, gap=0.25):
+    """All summaries and histograms as a plain dict."""
+    events = decoded[decoded["event"]]
+    ticks = events["ticks"].astype(np.int64)
+    intervals_us = (np.diff(decoded["t_ns"]) / 1e3)[~session_changes(decoded)]
+    rates = tuning_rates(decoded, window)
+    burst_ticks, burst_events = bursts(decoded, gap)
+    usage = button_usage(decoded)
+
+    per_rocker = {}
+    for index, name in enumerate(ROCKER_NAMES):
+        at = events["rocker"] == index
+        per_rocker[name] = {
+            "events": int(np.count_nonzero(at)),
+            "cw_ticks": int(ticks[at & (ticks > 0)].sum()),
+            "ccw_ticks": int(-ticks[at & (ticks < 0)].sum()),
+            "tap": {str(b + 1): int(n) for b, n in enumerate(usage[index, :, 0]) if n},
+            "hold": {str(b + 1): int(n) for b, n in enumerate(usage[index, :, 1]) if n},
+        }
+
+    return {
+        "records": int(len(decoded)),
+        "events": int(len(events)),
+        "sessions": int(len(np.unique(decoded["session"]))),
+        "span_s": round(session_spans(decoded), 3),
+        "ticks": {"cw": int(ticks[ticks > 0].sum()), "ccw": int(-ticks[ticks < 0].sum())},
+        "rockers": per_rocker,
+        "tuning_rate": {"window_s": window, **percentiles(rates),
+                        "histogram": log2_histogram(rates)},
+        "bursts": {"gap_s": gap, "count": int(len(burst_ticks)),
+                   "ticks": {**percentiles(burst_ticks), "histogram": log2_histogram(burst_ticks)},
+                   "events": percentiles(burst_events)},
+        "poll_interval_us": {**percentiles(intervals_us), "histogram": log2_histogram(intervals_us)},
+        "round_trip_us": percentiles(decoded["round_trip_ns"] / 1e3),
+    }
+
+
+def format_report(summary):
+    """Human readable text for analyze() output."""
+    lines = [f"{summary['records']} records, {summary['events']} events over {summary['span_s']:.1f} s "
+             f"in {summary['sessions']} session{'s' if summary['sessions'] != 1 else ''}",
+             f"ticks CW {summary['ticks']['cw']}  CCW {summary['ticks']['ccw']}"]
+    for name, rocker in summary["rockers"].items():
+        buttons = "  ".join(f"{b}:{n}" for b, n in rocker["tap"].items()) or "-"
+        holds = "  ".join(f"{b}:{n}" for b, n in rocker["hold"].items()) or "-"
+        lines.append(f"{name:<8} events {rocker['events']:>8}  CW {rocker['cw_ticks']:>8}  "
+                     f"CCW {rocker['ccw_ticks']:>8}  tap {buttons}  hold {holds}")
+    for title, key, unit in (("tuning rate", "tuning_rate", "ticks/s"),
+                             ("burst size", "bursts", "ticks"),
+                             ("poll interval", "poll_interval_us", "µs")):
+        stats = summary[key]["ticks"] if key == "bursts" else summary[key]
+        lines.append(f"{title:<14} p50 {stats['p50']:>10.1f}  p95 {stats['p95']:>10.1f}  "
+                     f"p99 {stats['p99']:>10.1f}  max {stats['max']:>10.1f}  ({unit})")
+        for upper, count in stats["histogram"].items():
+            lines.append(f"    <= {upper:>10}  {count}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze KPOD capture files")
+    parser.add_argument("captures", nargs="+", metavar="CAPTURE",
+                        help="capture files written with kpod_bridge.py --capture")
+    parser.add_argument("--window", type=float, default=0.1,
+                        help="tuning rate window in seconds (default 0.1)")
+    parser.add_argument("--gap", type=float, default=0.25,
+                        help="idle gap that ends a burst, in seconds (default 0.25)")
+    parser.add_argument("--json", metavar="PATH", help="also write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        decoded = load_sessions(args.captures)
+    except (OSError, CaptureError) as e:
+        parser.error(str(e))
+    summary = analyze(decoded, args.window, args.gap)
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
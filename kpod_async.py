@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Async Core
+One asyncio event loop driving any number of KPOD inputs and output endpoints
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kpod_sender import ITEM_MESSAGES, ITEM_DELTA, MidiSender
+from kpod_stats import PipelineStats
+
+
+class OutputEndpoint:
+    """
+    One output fed by the core.
+
+    Items queue in a bounded asyncio.Queue and a task on the core's loop
+    sends them through a MidiSender used as an encoder (its thread is never
+    started), so every endpoint tracks its own NRPN selection. A full queue
+    drops its oldest item.
+    """
+
+    def __init__(self, name, output, stats, log, queue_size=1024):
+        self.name = name
+        self.stats = stats
+        self.log = log
+        self.queue_size = queue_size
+        self.queue = None  # Created on the core's loop
+        self.sender = MidiSender(stats, log)
+        self.sender.set_output(output)
+
+    def put(self, item):
+        queue = self.queue
+        if queue.full():
+            queue.get_nowait()
+            self.stats.midi_drops += 1
+        queue.put_nowait(item)
+        depth = queue.qsize()
+        if depth > self.stats.midi_queue_max:
+            self.stats.midi_queue_max = depth
+
+    async def run(self):
+        """Endpoint task: send items as they arrive."""
+        queue = self.queue
+        send_item = self.sender.send_item
+        while True:
+            item = await queue.get()
+            try:
+                send_item(item)
+            except Exception as e:
+                self.stats.errors += 1
+                self.log(f"{self.name} send error: {e}", "ERROR")
+
+
+class FanoutSender:
+    """Stand-in for a bridge's MidiSender that hands items to core outputs."""
+
+    def __init__(self, core, outputs=None, stats=None):
+        self.core = core
+        self.outputs = outputs  # None = every output of the core
+        self.stats = stats or core.stats
+
+    @property
+    def depth(self):
+        outputs = self.core.outputs if self.outputs is None else self.outputs
+        return sum(endpoint.queue.qsize() for endpoint in outputs if endpoint.queue)
+
+    def set_output(self, output):
+        pass  # Outputs are registered on the core
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def submit_messages(self, messages, count=1, t_read=0):
+        self.core.dispatch((ITEM_MESSAGES, messages, count, t_read), self.outputs)
+
+    def submit_delta(self, mode, rocker, channel, ticks, t_read=0):
+        self.core.dispatch((ITEM_DELTA, (mode, rocker, channel), ticks, t_read), self.outputs)
+
+
+class AsyncBridgeCore:
+    """
+    Run KPOD inputs and output endpoints as tasks on one event loop.
+
+    Each input is a KPODBridge whose blocking HID calls run in a small
+    executor while decode, fan-out and sends happen on the loop. Adding a
+    pod or an output adds a task, not a polling thread.
+    """
+
+    def __init__(self, stats=None, queue_size=1024):
+        self.stats = stats or PipelineStats()
+        self.queue_size = queue_size
+        self.inputs = []
+        self.outputs = []
+        self.loop = None
+        self.loop_thread_id = None
+        self.executor = None
+        self.running = False
+
+    def log_message(self, message, level="INFO"):
+        if self.inputs:
+            self.inputs[0].log_message(message, level)
+
+    def add_input(self, bridge, outputs=None):
+        """Poll bridge's transport from the core; its items go to outputs (default all)."""
+        bridge.midi_sender = FanoutSender(self, outputs, bridge.stats)
+        self.inputs.append(bridge)
+
+    def add_output(self, name, output, stats=None):
+        """Register an object with send_message() as an output endpoint."""
+        endpoint = OutputEndpoint(name, output, stats or self.stats, self.log_message,
+                                  self.queue_size)
+        self.outputs.append(endpoint)
+        return endpoint
+
+    def on_loop(self):
+        return threading.get_ident() == self.loop_thread_id
+
+    def dispatch(self, item, outputs=None):
+        """Queue an output item on the given endpoints, or all of them."""
+        if not self.on_loop():
+            if self.loop:
+                self.loop.call_soon_threadsafe(self.dispatch, item, outputs)
+            return
+        for endpoint in self.outputs if outputs is None else outputs:
+            endpoint.put(item)
+
+    async def call(self, func, *args):
+        """
+        Await a blocking bridge call in the executor. If the awaiting task
+        is cancelled (Ctrl+C), wait for the call to return first, so the
+        device is never closed or left open behind a running call.
+        """
+        future = self.loop.run_in_executor(self.executor, func, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
+
+    async def poll_input(self, bridge):
+        """Input task: the bridge's poll steps with awaited reads and sleeps."""
+        try:
+            started = await self.call(bridge.begin_polling)
+        except asyncio.CancelledError:
+            bridge.cleanup_hid()
+            raise
+        if not started:
+            return
+
+        bridge.running = True
+        bridge.log_message("KPOD monitoring started (async core)")
+
+        try:
+            while self.running and bridge.running:
+                # Blocking HID calls in the executor, decode on the loop
+                if bridge.device is None:
+                    delay = await self.call(bridge.connect_step)
+                else:
+                    response = await self.call(bridge.send_kpod_command, 'u')
+                    delay = bridge.finish_poll(response)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            bridge.stats.errors += 1
+            bridge.log_message(f"KPOD worker error: {e}", "ERROR")
+        finally:
+            bridge.cleanup_hid()
+            bridge.log_message("KPOD monitoring stopped")
+
+    async def run(self):
+        """Run every input and output until stop() or all inputs finish."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.executor = ThreadPoolExecutor(max(1, len(self.inputs)), thread_name_prefix="kpod-hid")
+        self.running = True
+        for endpoint in self.outputs:
+            endpoint.queue = asyncio.Queue(endpoint.queue_size)
+
+        output_tasks = [asyncio.create_task(endpoint.run()) for endpoint in self.outputs]
+        try:
+            await asyncio.gather(*(self.poll_input(bridge) for bridge in self.inputs))
+        finally:
+            self.running = False
+            # Let queued output go out before the endpoints stop
+            for endpoint in self.outputs:
+                while not endpoint.queue.empty():
+                    try:
+                        endpoint.sender.send_item(endpoint.queue.get_nowait())
+                    except Exception:
+                        break
+            for task in output_tasks:
+                task.cancel()
+            await asyncio.gather(*output_tasks, return_exceptions=True)
+            self.executor.shutdown(wait=True)
+            self.loop_thread_id = None
+
+    def run_forever(self):
+        """Run the core on the calling thread; Ctrl+C raises KeyboardInterrupt."""
+        asyncio.run(self.run())
@@ -0,0 +1,1040 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Bridge Engine
+Headless HID to MIDI engine shared by the GUI and the console daemon
+"""
+
+import time
+STARTUP_T0 = time.perf_counter()  # Start of the startup timing report
+
+import argparse
+import signal
+import struct
+import sys
+import threading
+
+from kpod_accel import CURVES, EncoderAccelerator, default_profiles
+from kpod_connection import ConnectionSupervisor
+from kpod_dispatch import NOTE_MESSAGES, note_messages
+from kpod_log import ActivityLog, ConsoleSink, RotatingFileSink, LEVELS
+from kpod_multi import KPODGroup, device_target, parse_device_map
+from kpod_midi import (
+    ENCODER_MODES, ENCODER_MODE_NOTES, describe_encoder_target,
+)
+from kpod_poller import AdaptivePoller
+from kpod_profile import ProfileWatcher, compile_profile
+from kpod_sender import MidiSender, OVERFLOW_POLICIES, OVERFLOW_MERGE
+from kpod_startup import (
+    StartupCache, StartupTimer, VIRTUAL_PORT_NAME, default_port_pattern, find_port,
+)
+from kpod_stats import PipelineStats
+from kpod_transport import (
+    HIDTransport, SimulatedKPOD, EventGenerator, build_scenario, enumerate_kpods, SCENARIOS,
+    KPOD_USB_CMD_UPDATE, REPORT_LEN,
+)
+
+# TAP buttons: flags 0x41–0x48
+TAP_NOTE_MAP = {
+    0x41: 64, 0x42: 65, 0x43: 66, 0x44: 67,
+    0x45: 68, 0x46: 69, 0x47: 70, 0x48: 71,
+}
+
+# HOLD buttons: flags 0x51–0x58
+HOLD_NOTE_MAP = {
+    0x51: 72, 0x52: 73, 0x53: 74, 0x54: 75,
+    0x55: 76, 0x56: 77, 0x57: 78, 0x58: 79,
+}
+
+# Rocker position change MIDI notes (unique button-like events)
+ROCKER_POSITION_NOTES = {
+    "VFO A": 110,      # Switch to VFO A mode
+    "VFO B": 111,      # Switch to VFO B mode
+    "XIT/RIT": 112,    # Switch to XIT/RIT mode
+}
+
+# Encoder always sends the same notes regardless of rocker position
+ENCODER_NOTES = {
+    "CW": 100,         # Always clockwise = 100
+    "CCW": 101,        # Always counter-clockwise = 101
+}
+
+# Built-in mapping profile; profile files are overlaid on it
+DEFAULT_PROFILE = {
+    "name": "default",
+    "tap": {str(flag & 0x0F): note for flag, note in TAP_NOTE_MAP.items()},
+    "hold": {str(flag & 0x0F): note for flag, note in HOLD_NOTE_MAP.items()},
+    "rocker": dict(ROCKER_POSITION_NOTES),
+    "encoder": {
+        "VFO A": [ENCODER_NOTES["CW"], ENCODER_NOTES["CCW"]],
+        "VFO B": [ENCODER_NOTES["CW"], ENCODER_NOTES["CCW"]],
+        "XIT/RIT": [102, 103],  # XIT/RIT mode uses different encoder notes
+    },
+}
+
+# A 'u' event reply: command, signed ticks, controls, padding
+EVENT_REPORT = struct.Struct("<BhB4x")
+
+
+def pack_report(ticks, controls):
+    return EVENT_REPORT.pack(KPOD_USB_CMD_UPDATE, ticks, controls)
+
+
+# Human readable rocker names for status displays
+ROCKER_DISPLAY_NAMES = {
+    "VFO A": "VFO A (Left)",
+    "VFO B": "VFO B (Center)",
+    "XIT/RIT": "XIT/RIT (Right)",
+    "UNKNOWN": "Unknown (move rocker to detect)"
+}
+
+
+class BridgeState:
+    """
+    Latest-value snapshot of what the bridge is doing.
+
+    The worker overwrites fields and bumps counters; front ends read it at
+    their own frame rate and only ever see the newest values. Single
+    attribute writes are atomic, so no lock is needed.
+    """
+
+    def __init__(self):
+        self.status = {
+            "KPOD": ("Disconnected", "red"),
+            "MIDI": ("Disconnected", "red"),
+            "POLL": ("-", "black"),
+        }
+        self.rocker = ROCKER_DISPLAY_NAMES["UNKNOWN"]
+        self.last_action = "None"
+        self.midi_port = None  # Name of the opened MIDI output port
+
+        # Monotonic counters; readers derive rates from differences.
+        # Poll, event and error counts live in KPODBridge.stats.
+        self.encoder_ticks = 0   # Raw ticks, both directions
+        self.buttons = 0
+        self.rocker_changes = 0
+
+
+class KPODBridge:
+    """
+    HID to MIDI bridge engine.
+
+    Owns the KPOD transport, the MIDI output, the polling thread and the
+    activity log. Front ends read log records from activity_log and the
+    latest state from the state snapshot. Listeners can also subscribe to
+    message tuples: ("STATUS", component, status, color),
+    ("ROCKER", display_name) and ("ACTION", action).
+    """
+
+    def __init__(self, transport=None, poller=None, encoder_mode=ENCODER_MODE_NOTES,
+                 accelerator=None, activity_log=None, midi_out=None, midi_sender=None,
+                 hid_process=False, midi_channel=0, midi_port=None, name=None,
+                 cache=None, startup=None, supervisor=None, reconnect=True, capture=None,
+                 midi=True):
+        # State variables
+        self.midi_out = midi_out  # Preopened output (e.g. a benchmark stand-in), else set up later
+        self.transport = transport or HIDTransport()
+        self.poller = poller or AdaptivePoller()
+        self.encoder_mode = encoder_mode  # One of kpod_midi.ENCODER_MODES
+        self.accelerator = accelerator  # Optional EncoderAccelerator, None = 1:1 ticks
+        self.midi_channel = midi_channel  # 0-15
+        self.midi_port = midi_port  # Port name, substring or regex; None = platform default
+        self.name = name  # Device label when several KPODs are bridged
+        self.cache = cache  # Optional StartupCache of the last working MIDI port
+        self.startup = startup  # Optional StartupTimer
+        self.capture = capture  # Optional kpod_capture.CaptureWriter for raw replies
+        self.midi_enabled = midi  # False = other outputs only, no MIDI port
+        self.report_sinks = []  # Get each report's events together, e.g. kpod_network
+        self.report_handler = self.handle_report  # Where decoded event reports go
+
+        # Compiled mapping profile: decode of every controls byte, per-rocker
+        # encoder output and rocker notes. Replaced as a whole on reload.
+        self.profile = compile_profile(DEFAULT_PROFILE, midi_channel)
+        self.profile_watcher = None
+        if midi_channel:
+            self.note_table = tuple(note_messages(note, channel=midi_channel) for note in range(128))
+        else:
+            self.note_table = NOTE_MESSAGES
+        self.device = None  # Open transport while monitoring
+        self.device_identity = None  # Identity of the last KPOD that was set up
+        self.link_lost = False  # Set between a dropout and the reconnect
+        # Reconnects after unplugs and USB errors; None = stop monitoring instead
+        self.supervisor = (supervisor or ConnectionSupervisor()) if reconnect else None
+        self.stop_event = threading.Event()  # Interrupts waits between poll steps
+        self.current_rocker = "UNKNOWN"  # Track position: VFO A, VFO B, XIT/RIT, UNKNOWN
+        self.running = False
+        self.kpod_thread = None
+        self.hid_process = hid_process  # Poll HID in a child process instead of a thread
+
+        # Latest-value snapshot for front ends, plus optional message observers
+        self.state = BridgeState()
+        self.listeners = []
+
+        # Latency histograms and pipeline counters
+        self.stats = PipelineStats()
+        self.last_write_ns = 0  # perf_counter_ns when the last command was written
+        self.last_read_ns = 0  # perf_counter_ns when the last report arrived
+
+        # Bounded activity log; formatting is deferred to its readers
+        self.activity_log = activity_log or ActivityLog()
+
+        # MIDI goes out on its own thread so the poll loop never waits on it
+        self.midi_sender = midi_sender or MidiSender(self.stats, self.log_message)
+        self.midi_sender.stats = self.stats
+        self.midi_sender.set_output(self.midi_out)
+        if startup:
+            self.midi_sender.on_first_send = startup.first_midi_event
+
+    @property
+    def dispatch(self):
+        return self.profile.dispatch
+
+    @property
+    def encoder_table(self):
+        return self.profile.encoder_table
+
+    def set_profile(self, profile):
+        """Swap in a compiled profile; the worker picks it up on its next report."""
+        self.profile = profile
+        self.log_message(f"Mapping profile '{profile.name}' loaded" +
+                         (f" from {profile.source}" if profile.source else ""))
+
+    def watch_profile(self, path, interval=1.0):
+        """Load a profile file now and reload it whenever it changes."""
+        if self.profile_watcher:
+            self.profile_watcher.stop()
+        self.profile_watcher = ProfileWatcher(path, DEFAULT_PROFILE, self.set_profile,
+                                              self.midi_channel, self.log_message, interval)
+        loaded = self.profile_watcher.load() is not None
+        self.profile_watcher.start()
+        return loaded
+
+    def add_report_sink(self, sink):
+        """Register an object with submit_report(), called once per report that did something."""
+        self.report_sinks.append(sink)
+
+    def add_listener(self, listener):
+        """Register a callable that receives every bridge message tuple."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregister a previously added listener."""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def publish(self, *message):
+        """Deliver a message tuple to all listeners."""
+        if not self.listeners:
+            return
+        for listener in list(self.listeners):
+            try:
+                listener(message)
+            except Exception:
+                pass
+
+    def log_message(self, message, level="INFO", count=1):
+        """Add a message to the activity log, as if logged count times in a row."""
+        if self.name:
+            message = f"[{self.name}] {message}"
+        self.activity_log.add(message, level, count)
+
+    def update_status(self, component, status, color="black"):
+        """Update connection status."""
+        self.state.status[component] = (status, color)
+        self.publish("STATUS", component, status, color)
+
+    def update_last_action(self, action):
+        """Update last action display."""
+        self.state.last_action = action
+        self.publish("ACTION", action)
+
+    def update_rocker_display(self, position):
+        """Update rocker position display."""
+        display_name = ROCKER_DISPLAY_NAMES.get(position, position)
+        self.state.rocker = display_name
+        self.publish("ROCKER", display_name)
+
+    def setup_midi(self):
+        """Initialize MIDI output connection."""
+        if self.midi_out:
+            return True  # Already open, or supplied by the caller
+        if not self.midi_enabled:
+            self.update_status("MIDI", "Off", "black")
+            return True
+
+        try:
+            # Ensure we're on the main thread for MIDI initialization
+            if threading.current_thread() != threading.main_thread():
+                self.log_message("MIDI setup must be on main thread", "ERROR")
+                return False
+
+            import rtmidi  # Deferred: only needed once MIDI is set up
+            self.midi_out = rtmidi.MidiOut()
+
+            ports = self.midi_out.get_ports()
+            self.log_message(f"Available MIDI ports: {ports}")
+
+            cache_key = self.name or "default"
+            pattern = self.midi_port if self.midi_port is not None else default_port_pattern()
+            cached = self.cache.get("midi_ports", cache_key) if self.cache else None
+            port_index = find_port(ports, pattern, cached)
+
+            if port_index is None and pattern is None and sys.platform.startswith("linux"):
+                # Nothing to connect to: offer a port other programs can connect to
+                port_name = VIRTUAL_PORT_NAME + (f" {self.name}" if self.name else "")
+                self.midi_out.open_virtual_port(port_name)
+            elif port_index is None and pattern is None and ports:
+                port_index = 0  # No preference configured: first available port
+            elif port_index is None:
+                if pattern == "IAC":
+                    self.log_message("IAC Driver not found. Please enable it in Audio MIDI Setup.", "ERROR")
+                    self.update_status("MIDI", "IAC Driver not found", "red")
+                else:
+                    self.log_message(f"No MIDI port matching '{pattern}'", "ERROR")
+                    self.update_status("MIDI", f"'{pattern}' not found", "red")
+                self.midi_out = None
+                return False
+
+            if port_index is not None:
+                self.midi_out.open_port(port_index)
+                port_name = ports[port_index]
+                if self.cache:
+                    self.cache.set("midi_ports", cache_key, port_name)
+            self.midi_sender.set_output(self.midi_out)
+            if self.startup:
+                self.startup.mark("MIDI ready")
+            self.state.midi_port = port_name
+            self.log_message(f"Connected to MIDI: {port_name} (channel {self.midi_channel + 1})")
+            self.update_status("MIDI", f"Connected: {port_name}", "green")
+            return True
+
+        except Exception as e:
+            self.log_message(f"MIDI setup failed: {e}", "ERROR")
+            self.update_status("MIDI", f"Error: {e}", "red")
+            # Clean up on error
+            if hasattr(self, 'midi_out') and self.midi_out:
+                try:
+                    self.midi_out.close_port()
+                except:
+                    pass
+                self.midi_out = None
+            return False
+
+    def send_kpod_command(self, cmd_char, data=None):
+        """Send a command to KPOD and read response."""
+        if not self.device:
+            return None
+
+        try:
+            if data is None:
+                data = [0] * 7
+
+            # Ensure data is exactly 7 bytes
+            cmd_data = data[:7] + [0] * (7 - len(data))
+
+            # Create command packet
+            pkt = bytes([ord(cmd_char)] + cmd_data)
+            t_write = self.last_write_ns = time.perf_counter_ns()
+            self.device.write(pkt)
+
+            # Read response
+            t_written = time.perf_counter_ns()
+            response = self.device.read(REPORT_LEN)
+            t_read = self.last_read_ns = time.perf_counter_ns()
+
+            stats = self.stats
+            stats.record("write", t_write, t_written)
+            stats.record("read", t_written, t_read)
+            stats.record("poll", t_write, t_read)
+            return response
+        except Exception as e:
+            self.stats.errors += 1
+            self.log_message(f"Command '{cmd_char}' failed: {e}", "ERROR")
+            return None
+
+    def detect_rocker_position_from_event(self, controls, has_activity):
+        """
+        Detect rocker position from event data.
+        Returns new position string or None if no change.
+        """
+        # Left rocker (VFO A) / right rocker (XIT/RIT) come straight from the table
+        new_position = self.profile.dispatch[controls].rocker
+
+        if new_position is None and controls == 0x00:
+            # Controls = 0x00 with encoder/button activity = VFO B (center),
+            # or a transition to center from A or XIT/RIT
+            if has_activity or self.current_rocker not in ["VFO B", "UNKNOWN"]:
+                new_position = "VFO B"
+
+        return new_position
+
+    def send_rocker_position_change(self, new_position):
+        """Send MIDI note for rocker position change."""
+        profile = self.profile
+        if new_position in profile.rocker_notes:
+            note = profile.rocker_notes[new_position]
+            self.send_messages(profile.rocker_messages[new_position])
+            action = f"Rocker → {new_position} (MIDI Note {note})"
+            self.log_message(action)
+            self.update_last_action(action)
+            return True
+        return False
+
+    def get_device_info(self):
+        """Get KPOD device ID and firmware version."""
+        try:
+            # Get Device ID
+            id_response = self.send_kpod_command('=')
+            if id_response and len(id_response) >= 8:
+                id_string = ''.join(chr(b) for b in id_response[1:8] if b != 0)
+                self.log_message(f"Device ID: {id_string}")
+
+            # Get Firmware Version
+            ver_response = self.send_kpod_command('v')
+            if ver_response and len(ver_response) >= 3:
+                version_bcd = struct.unpack("<h", bytes(ver_response[1:3]))[0]
+                # Convert BCD to version string (e.g., 108 -> "1.08")
+                major = version_bcd // 100
+                minor = version_bcd % 100
+                version_str = f"{major}.{minor:02d}"
+                self.log_message(f"Firmware Version: {version_str}")
+
+        except Exception as e:
+            self.log_message(f"Failed to get device info: {e}", "ERROR")
+
+    def setup_hid(self, quiet=False):
+        """
+        Initialize HID device connection and get device info.
+        Device info is only read when a different KPOD than last time is
+        opened. quiet keeps failed reconnect attempts out of the error log.
+        """
+        try:
+            transport = self.transport
+            transport.open()
+            self.device = transport
+            if self.startup:
+                self.startup.mark("KPOD open")
+            self.log_message(f"Connected to KPOD ({transport.name})")
+            self.update_status("KPOD", "Connected", "green")
+
+            # Get device information
+            if transport.identity != self.device_identity or transport.identity is None:
+                self.get_device_info()
+                self.device_identity = transport.identity
+
+            return True
+        except Exception as e:
+            if quiet:
+                self.log_message(f"Could not reopen KPOD: {e}", "DEBUG")
+            else:
+                self.log_message(f"Could not open KPOD: {e}", "ERROR")
+                self.update_status("KPOD", f"Error: {e}", "red")
+            self.cleanup_hid()
+            return False
+
+    def check_link(self, response):
+        """
+        Look at a poll that got no report. Returns False, after dropping the
+        connection, if the KPOD is gone: the transport raised (None) or too
+        many reads in a row timed out (b"").
+        """
+        if response is None:
+            self.connection_lost("USB error")
+            return False
+        if not response:
+            self.stats.hid_timeouts += 1
+            supervisor = self.supervisor
+            if supervisor and supervisor.timed_out(self.stats.polls):
+                self.connection_lost(f"no reply to {supervisor.max_timeouts} polls")
+                return False
+        return True
+
+    def connection_lost(self, reason):
+        """Close the dead device; the worker reconnects if a supervisor is set."""
+        self.stats.disconnects += 1
+        self.link_lost = True
+        self.cleanup_hid()
+        if self.supervisor:
+            self.supervisor.lost()
+            self.log_message(f"KPOD connection lost ({reason}), reconnecting...", "WARNING")
+            self.update_status("KPOD", "Reconnecting...", "orange")
+        else:
+            self.log_message(f"KPOD connection lost ({reason})", "ERROR")
+            self.update_status("KPOD", "Disconnected", "red")
+
+    def reconnect_hid(self):
+        """One reconnect attempt after a dropout; True once the KPOD is open again."""
+        try:
+            if not self.transport.is_present():
+                return False  # Enumeration is cheaper than a failing open
+        except Exception:
+            return False
+        if not self.setup_hid(quiet=True):
+            return False
+
+        lost_ns, now_ns = self.supervisor.recovered()
+        self.poller.reset()
+        if self.accelerator:
+            self.accelerator.reset()
+        if not self.link_lost:
+            return True  # First connection after starting without a KPOD
+        self.link_lost = False
+
+        self.stats.reconnects += 1
+        self.stats.record("recover", lost_ns, now_ns)
+        if not self.supervisor.keeps_rocker(now_ns - lost_ns):
+            self.forget_rocker()
+        self.log_message(f"KPOD reconnected after {(now_ns - lost_ns) / 1e9:.2f} s")
+        return True
+
+    def forget_rocker(self):
+        """Too long to trust the old rocker position; the next report sets it."""
+        self.current_rocker = "UNKNOWN"
+        self.update_rocker_display("UNKNOWN")
+
+    def send_note(self, note, velocity=127):
+        """Send MIDI Note On followed by Note Off."""
+        if velocity == 127:
+            self.send_messages(self.note_table[note])
+        else:
+            self.send_messages(note_messages(note, velocity, self.midi_channel))
+
+    def send_messages(self, messages, count=1):
+        """Queue prebuilt MIDI messages, count times, for the sender thread."""
+        self.midi_sender.submit_messages(messages, count, self.last_read_ns)
+
+    def send_encoder_delta(self, ticks):
+        """Send one coalesced relative CC / NRPN update for a poll's ticks."""
+        self.midi_sender.submit_delta(self.encoder_mode, self.current_rocker,
+                                      self.midi_channel, ticks, self.last_read_ns)
+        direction = "CW" if ticks > 0 else "CCW"
+        target = describe_encoder_target(self.encoder_mode, self.current_rocker)
+        action = f"Encoder {direction} ×{abs(ticks)} → {target} (at {self.current_rocker})"
+        self.log_message(action)
+        self.update_last_action(action)
+
+    def get_encoder_notes(self, rocker=None):
+        """Get encoder MIDI notes based on rocker position."""
+        if rocker is None:
+            rocker = self.current_rocker
+        entry = self.profile.encoder_table[rocker]
+        return (entry.cw_note, entry.ccw_note)
+
+    def handle_response(self, response):
+        """Count one 'u' poll and decode its reply; returns True if it carried an event."""
+        stats = self.stats
+        stats.polls += 1
+        if self.capture is not None:
+            self.capture.add(self.last_write_ns, self.last_read_ns, response)
+        if response and len(response) == 8:
+            cmd_reply = response[0]
+            ticks = struct.unpack("<h", bytes(response[1:3]))[0]
+            controls = response[3]
+
+            # Only process if there's a new event
+            if cmd_reply == KPOD_USB_CMD_UPDATE:
+                self.report_handler(ticks, controls)
+                return True
+            stats.empty_polls += 1
+        return False
+
+    def handle_report(self, ticks, controls):
+        """Decode one event report and queue its MIDI output."""
+        state = self.state
+        stats = self.stats
+        profile = self.profile  # One consistent profile for the whole report
+        t_read = self.last_read_ns
+        entry = profile.dispatch[controls]
+        has_activity = ticks != 0 or entry.button_bits != 0
+        stats.events += 1
+        state.encoder_ticks += abs(ticks)
+
+        # Detect rocker position changes
+        new_position = self.detect_rocker_position_from_event(controls, has_activity)
+        stats.record("decode", t_read, time.perf_counter_ns())
+        rocker_changed = new_position and new_position != self.current_rocker
+        if rocker_changed:
+            # Send MIDI note for rocker position change
+            self.send_rocker_position_change(new_position)
+            self.current_rocker = new_position
+            state.rocker_changes += 1
+            self.update_rocker_display(new_position)
+
+        # Scale ticks by spin rate using the rocker's profile
+        if ticks and self.accelerator:
+            ticks = self.accelerator.scale(ticks, self.current_rocker)
+
+        # Handle encoder - position-dependent notes
+        # VFO A/B: 100/101, XIT/RIT: 102/103
+        if ticks and self.encoder_mode != ENCODER_MODE_NOTES:
+            # One relative CC / NRPN update for the whole poll
+            self.send_encoder_delta(ticks)
+        elif ticks:
+            encoder = profile.encoder_table[self.current_rocker]
+            if ticks > 0:
+                messages, action = encoder.cw_messages, encoder.cw_action
+            else:
+                messages, action = encoder.ccw_messages, encoder.ccw_action
+            self.send_messages(messages, abs(ticks))
+            self.log_message(action, count=abs(ticks))
+            self.update_last_action(action)
+
+        # Handle buttons: note and messages come from the table
+        if entry.messages:
+            state.buttons += 1
+            self.send_messages(entry.messages)
+            self.log_message(entry.action)
+            self.update_last_action(entry.action)
+
+        # Network outputs get the whole report in one call
+        if self.report_sinks and (rocker_changed or ticks or entry.button_bits):
+            for sink in self.report_sinks:
+                sink.submit_report(self.name, self.current_rocker, bool(rocker_changed), ticks,
+                                   entry.button_bits, entry.tap_hold)
+
+    # Poll driver steps. The worker thread, the HID child process and the
+    # async core all run the same loop:
+    #     begin_polling(), then while running:
+    #         wait poll_step() seconds (stop on None)
+    # where the async core splits poll_step() into the blocking
+    # send_kpod_command('u') / connect_step() and the non-blocking finish_poll().
+
+    def begin_polling(self):
+        """Open the KPOD for a poll driver; False if it is missing and nobody reconnects."""
+        if not self.setup_hid():
+            if not self.supervisor:
+                return False
+            # Keep looking until the KPOD is plugged in
+            self.supervisor.lost()
+            self.log_message("Waiting for a KPOD to be connected...", "WARNING")
+            self.update_status("KPOD", "Waiting for KPOD", "orange")
+        self.poller.reset()
+        if self.accelerator:
+            self.accelerator.reset()
+        return True
+
+    def connect_step(self):
+        """One reconnect attempt; returns the wait before the next step, None to stop."""
+        if not self.supervisor:
+            return None
+        if self.reconnect_hid():
+            return 0.0
+        return self.supervisor.next_delay()
+
+    def finish_poll(self, response):
+        """Handle the reply to a 'u' poll; returns the wait before the next poll, None to stop."""
+        if not response and not self.check_link(response):
+            return 0.0
+        active = self.handle_response(response)
+        if self.transport.finished:
+            self.log_message("Replay finished")
+            return None
+
+        # Poll back-to-back while in use, back off when idle
+        poller = self.poller
+        if poller.update_rate():
+            self.update_status("POLL", f"{poller.poll_rate:.0f} polls/s")
+        return poller.next_interval(active)
+
+    def poll_step(self):
+        """One blocking driver step: a poll, or a reconnect attempt while the KPOD is away."""
+        if self.device is None:
+            return self.connect_step()
+        return self.finish_poll(self.send_kpod_command('u'))
+
+    def kpod_worker(self):
+        """Worker thread for KPOD communication."""
+        if not self.begin_polling():
+            return
+
+        self.log_message("KPOD monitoring started")
+        if self.startup:
+            self.startup.mark("polling")
+
+        try:
+            while self.running:
+                delay = self.poll_step()
+                if delay is None:
+                    break
+                if delay > 0:
+                    self.stop_event.wait(delay)
+
+        except Exception as e:
+            self.stats.errors += 1
+            self.log_message(f"KPOD worker error: {e}", "ERROR")
+        finally:
+            self.cleanup_hid()
+            self.log_message("KPOD monitoring stopped")
+
+    def process_worker(self):
+        """Worker thread consuming event reports from the HID poll process."""
+        from kpod_process import FLAG_ROCKER_RESET, HIDProcess  # Pulls in multiprocessing
+        hid = HIDProcess(self.transport, self.poller, reconnect=self.supervisor is not None)
+        if self.accelerator:
+            self.accelerator.reset()
+        stats = self.stats
+
+        try:
+            hid.start()
+            self.log_message(f"KPOD monitoring started (HID process {hid.pid})")
+            done = False
+            while self.running:
+                # Checked first: a child that has exited has also sent everything
+                alive = hid.is_alive()
+                for message in hid.messages():
+                    if message[0] == "LOG":
+                        self.log_message(*message[1:])
+                    elif message[0] == "STATUS":
+                        self.update_status(*message[1:])
+                    elif message[0] == "DONE":
+                        done = True  # The child sends this after its last record
+
+                records = hid.read(0 if done else 0.1)
+                for t_write, t_read, ticks, controls, flags in records:
+                    if flags & FLAG_ROCKER_RESET:
+                        self.forget_rocker()
+                        continue
+                    self.last_read_ns = t_read
+                    stats.record("poll", t_write, t_read)
+                    if self.capture is not None:
+                        # The ring carries the decoded fields; rebuild the reply
+                        self.capture.add(t_write, t_read, pack_report(ticks, controls))
+                    self.handle_report(ticks, controls)
+                hid.update_stats(stats)
+
+                if done and not records:
+                    break
+                if not records and not alive:
+                    self.log_message("HID process exited", "ERROR")
+                    break
+
+        except Exception as e:
+            stats.errors += 1
+            self.log_message(f"KPOD worker error: {e}", "ERROR")
+        finally:
+            hid.stop()
+            self.log_message("KPOD monitoring stopped")
+
+    def dump_stats(self, path):
+        """Write latency and counter statistics to path (.csv or JSON)."""
+        try:
+            self.stats.dump(path)
+            self.log_message(f"Statistics written to {path}")
+            return True
+        except Exception as e:
+            self.log_message(f"Could not write statistics: {e}", "ERROR")
+            return False
+
+    def start(self):
+        """Start KPOD monitoring on a background thread."""
+        if self.running:
+            return False
+        self.running = True
+        self.stop_event.clear()
+        self.midi_sender.start()
+        worker = self.process_worker if self.hid_process else self.kpod_worker
+        self.kpod_thread = threading.Thread(target=worker, daemon=True)
+        self.kpod_thread.start()
+        self.log_message("Starting KPOD monitoring...")
+        return True
+
+    def stop(self):
+        """Stop KPOD monitoring."""
+        if not self.running:
+            return False
+        self.running = False
+        self.stop_event.set()
+        self.update_status("KPOD", "Disconnected", "red")
+        self.log_message("Stopping KPOD monitoring...")
+        return True
+
+    def is_alive(self):
+        """Return True while the worker thread is running."""
+        return bool(self.kpod_thread and self.kpod_thread.is_alive())
+
+    def cleanup_hid(self):
+        """Clean up HID resources."""
+        if self.device:
+            try:
+                self.device.close()
+                self.device = None
+            except:
+                pass
+
+    def cleanup_midi(self):
+        """Clean up MIDI resources."""
+        # Let the sender drain what is queued before the port goes away
+        self.midi_sender.stop()
+        self.midi_sender.set_output(None)
+        if self.midi_out:
+            try:
+                self.midi_out.close_port()
+                self.midi_out = None
+            except:
+                pass
+        self.state.midi_port = None
+
+    def close(self):
+        """Stop the worker and release HID and MIDI resources."""
+        self.running = False
+        self.stop_event.set()
+        if self.profile_watcher:
+            self.profile_watcher.stop()
+        if self.is_alive():
+            self.kpod_thread.join(timeout=1)
+        self.cleanup_hid()
+        self.cleanup_midi()
+        self.activity_log.flush()
+
+
+def run_headless(bridge=None, require_midi=True, stats_file=None, use_async=False):
+    """
+    Run the bridge as a console daemon until the worker exits or Ctrl+C.
+    With stats_file, statistics are written there on SIGUSR1 and at exit.
+    With use_async, the bridge is driven by an AsyncBridgeCore instead of
+    its worker thread. bridge may also be a KPODGroup.
+    """
+    bridge = bridge or KPODBridge()
+    console = ConsoleSink()
+    bridge.activity_log.add_sink(console)
+    bridge.log_message("KPOD to MIDI Bridge v2 started (headless)")
+
+    if stats_file and hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: bridge.dump_stats(stats_file))
+
+    if not bridge.setup_midi() and require_midi:
+        bridge.close()
+        console.close()
+        return 1
+
+    if use_async:
+        from kpod_async import AsyncBridgeCore
+        bridges = getattr(bridge, "bridges", [bridge])
+        core = AsyncBridgeCore(bridges[0].stats, bridges[0].midi_sender.capacity)
+        for device in bridges:
+            # Each device keeps its own output and statistics
+            outputs = []
+            if device.midi_out:
+                endpoint = core.add_output(device.name or "MIDI", device.midi_out, device.stats)
+                if device.startup:
+                    endpoint.sender.on_first_send = device.startup.first_midi_event
+                outputs.append(endpoint)
+            core.add_input(device, outputs)
+        bridge.log_message("Starting KPOD monitoring...")
+        try:
+            core.run_forever()
+        except KeyboardInterrupt:
+            bridge.log_message("Interrupted, shutting down")
+        finally:
+            bridge.close()
+            if stats_file:
+                bridge.dump_stats(stats_file)
+            console.close()
+        return 0
+
+    bridge.start()
+    try:
+        # Sleep rather than join: an interrupted join() leaves the thread
+        # looking finished, and close() would then skip waiting for it
+        while bridge.is_alive():
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        bridge.log_message("Interrupted, shutting down")
+    finally:
+        bridge.close()
+        if stats_file:
+            bridge.dump_stats(stats_file)
+        console.close()
+    return 0
+
+
+def main(argv=None):
+    """Entry point: console daemon with --headless, GUI otherwise."""
+    parser = argparse.ArgumentParser(description="KPOD to MIDI Bridge v2")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the HID to MIDI loop without the Tk GUI")
+    parser.add_argument("--simulate", choices=SCENARIOS, metavar="SCENARIO",
+                        help="use a simulated KPOD running a load scenario "
+                             f"({', '.join(SCENARIOS)}) instead of USB HID")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play a capture file back as the KPOD instead of USB HID")
+    parser.add_argument("--replay-speed", type=float, default=1.0, metavar="X",
+                        help="replay at X times the original timing; 0 = as fast as possible")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="record raw KPOD event reports to a binary capture file")
+    parser.add_argument("--capture-polls", action="store_true",
+                        help="with --capture, also record empty polls (for poll timing)")
+    parser.add_argument("--ticks-per-second", type=float, default=50.0,
+                        help="encoder spin rate for simulated scenarios (default 50)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="length of one simulated scenario pass in seconds (default 10)")
+    parser.add_argument("--idle-interval", type=float, default=25.0,
+                        help="longest poll interval when the KPOD is idle, in ms (default 25)")
+    parser.add_argument("--active-interval", type=float, default=0.0,
+                        help="poll interval while the KPOD is in use, in ms (default 0 = back-to-back)")
+    parser.add_argument("--encoder-mode", choices=ENCODER_MODES, default=ENCODER_MODE_NOTES,
+                        help="encoder output: one note per tick, relative CC or NRPN delta per poll")
+    parser.add_argument("--accel", choices=("off",) + tuple(CURVES), default="off",
+                        help="encoder acceleration curve for VFO A/B (default off)")
+    parser.add_argument("--midi-port", metavar="NAME",
+                        help="MIDI output port: exact name, substring or regex "
+                             "(default: IAC on macOS, a virtual port on Linux)")
+    parser.add_argument("--auto-start", action="store_true",
+                        help="GUI: start monitoring as soon as the window is up")
+    parser.add_argument("--cache-file", metavar="PATH",
+                        help="where to remember the last MIDI port")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the startup cache")
+    parser.add_argument("--read-timeout", type=float, default=100.0, metavar="MS",
+                        help="longest wait for a KPOD reply, in ms (default 100)")
+    parser.add_argument("--no-reconnect", action="store_true",
+                        help="stop monitoring when the KPOD is lost instead of reconnecting")
+    parser.add_argument("--hid-process", action="store_true",
+                        help="poll the KPOD in a separate process, isolated from GUI load")
+    parser.add_argument("--async-core", action="store_true",
+                        help="headless: drive the KPOD and MIDI output from one asyncio event loop")
+    parser.add_argument("--all-devices", action="store_true",
+                        help="bridge every connected KPOD, each with its own worker")
+    parser.add_argument("--simulate-devices", type=int, default=1, metavar="N",
+                        help="with --simulate, run N simulated KPODs (default 1)")
+    parser.add_argument("--device-map", action="append", metavar="KEY=CHANNEL[@PORT]",
+                        help="send a device (serial or 1-based position) on MIDI channel 1-16, "
+                             "optionally to the port whose name contains PORT (repeatable)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="mapping profile (.json or .toml), reloaded when the file changes")
+    parser.add_argument("--send-to", action="append", metavar="URL",
+                        help="also send each report over UDP: osc://HOST:PORT for an OSC "
+                             "bundle, udp://HOST:PORT for a compact binary datagram (repeatable)")
+    parser.add_argument("--no-midi", action="store_true",
+                        help="do not open a MIDI port (use with --send-to)")
+    parser.add_argument("--midi-queue", type=int, default=1024,
+                        help="MIDI sender queue capacity in items (default 1024)")
+    parser.add_argument("--midi-overflow", choices=OVERFLOW_POLICIES, default=OVERFLOW_MERGE,
+                        help="what to do when the MIDI queue is full (default merge)")
+    parser.add_argument("--log-level", choices=tuple(LEVELS), default="INFO",
+                        help="lowest level kept in the activity log (default INFO)")
+    parser.add_argument("--log-capacity", type=int, default=2000,
+                        help="number of records kept in the in-memory log (default 2000)")
+    parser.add_argument("--log-file", metavar="PATH",
+                        help="also write the activity log to a rotating file")
+    parser.add_argument("--stats-file", metavar="PATH",
+                        help="headless: write latency statistics (JSON, or CSV for *.csv) "
+                             "on SIGUSR1 and at exit")
+    args = parser.parse_args(argv)
+    if args.async_core and not args.headless:
+        parser.error("--async-core needs --headless")
+    if args.async_core and args.hid_process:
+        parser.error("--async-core and --hid-process cannot be combined")
+    if args.log_capacity < 1:
+        parser.error("--log-capacity must be at least 1")
+    if args.midi_queue < 2:
+        parser.error("--midi-queue must be at least 2")
+    if args.active_interval < 0:
+        parser.error("--active-interval must not be negative")
+    if args.idle_interval < args.active_interval:
+        parser.error("--idle-interval must not be shorter than --active-interval")
+    try:
+        device_map = parse_device_map(args.device_map)
+    except ValueError as e:
+        parser.error(str(e))
+
+    activity_log = ActivityLog(args.log_capacity, args.log_level)
+    startup = StartupTimer(STARTUP_T0, activity_log.add)
+    startup.mark("imports")
+    cache = None if args.no_cache else StartupCache(args.cache_file)
+    file_sink = None
+    if args.log_file:
+        file_sink = RotatingFileSink(args.log_file)
+        activity_log.add_sink(file_sink)
+
+    if args.replay:
+        from kpod_capture import ReplayKPOD
+        transports = [ReplayKPOD(args.replay, args.replay_speed)]
+    elif args.simulate:
+        segments = build_scenario(args.simulate, args.ticks_per_second, args.duration)
+        # ~1 ms reply time, like a full-speed USB interrupt endpoint
+        transports = [SimulatedKPOD(EventGenerator(segments, loop=True), response_delay=0.001,
+                                    serial=f"SIM{i + 1}" if args.simulate_devices > 1 else None)
+                      for i in range(max(1, args.simulate_devices))]
+    elif args.all_devices:
+        try:
+            transports = enumerate_kpods()
+        except Exception as e:
+            # e.g. hid not installed; opening the default KPOD reports it too
+            activity_log.add(f"Could not list KPODs: {e}", "ERROR")
+            transports = []
+        transports = transports or [HIDTransport()]
+    else:
+        transports = [HIDTransport()]
+
+    def make_bridge(index, transport):
+        channel, port, name = device_target(device_map, index, transport, args.midi_port)
+        transport.read_timeout = args.read_timeout / 1000.0
+        poller = AdaptivePoller(active_interval=args.active_interval / 1000.0,
+                                idle_interval=args.idle_interval / 1000.0)
+        accelerator = None
+        if args.accel != "off":
+            accelerator = EncoderAccelerator(default_profiles(args.accel))
+        midi_sender = MidiSender(None, activity_log.add, args.midi_queue, args.midi_overflow)
+        capture = None
+        if args.capture:
+            path = args.capture if len(transports) == 1 else device_capture_path(args.capture, name)
+            try:
+                capture = CaptureWriter(path, events_only=not args.capture_polls)
+            except OSError as e:
+                parser.error(f"cannot write capture file: {e}")
+            captures.append(capture)
+        return KPODBridge(transport, poller, args.encoder_mode, accelerator, activity_log,
+                          midi_sender=midi_sender, hid_process=args.hid_process,
+                          midi_channel=channel, midi_port=port,
+                          name=name if len(transports) > 1 else None,
+                          cache=cache, startup=startup, reconnect=not args.no_reconnect,
+                          capture=capture, midi=not args.no_midi)
+
+    captures = []
+    if args.capture:
+        from kpod_capture import CaptureWriter, device_capture_path
+
+    network_sinks = []
+    if args.send_to:
+        from kpod_network import NetworkSink, parse_sink_url
+        for url in args.send_to:
+            try:
+                fmt, host, port = parse_sink_url(url)
+                network_sinks.append(NetworkSink(host, port, fmt, activity_log.add))
+            except (ValueError, OSError) as e:
+                parser.error(f"{url}: {e}")
+
+    bridges = [make_bridge(i, transport) for i, transport in enumerate(transports)]
+    for device in bridges:
+        for sink in network_sinks:
+            device.add_report_sink(sink)
+    bridge = bridges[0] if len(bridges) == 1 else KPODGroup(bridges, activity_log)
+    if args.profile:
+        bridge.watch_profile(args.profile)
+
+    try:
+        if args.headless:
+            # Simulated runs are useful on machines without a MIDI port
+            return run_headless(bridge, require_midi=not (args.simulate or args.replay),
+                                stats_file=args.stats_file, use_async=args.async_core)
+
+        # Only pull in tkinter when the GUI is actually wanted
+        from gui_main import KPODBridgeGUI
+        KPODBridgeGUI(bridge, auto_start=args.auto_start).run()
+        return 0
+    finally:
+        for sink in network_sinks:
+            sink.close()
+            activity_log.add(f"Network output {sink.url}: {sink.sent} datagrams sent" +
+                             (f", {sink.dropped} dropped" if sink.dropped else ""))
+        for capture in captures:
+            capture.close()
+            activity_log.add(f"Captured {capture.records} reports to {capture.path}" +
+                             (f" ({capture.dropped} dropped)" if capture.dropped else ""))
+        if file_sink:
+            file_sink.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Session Capture
+Record raw 'u' replies to a compact binary file and replay them as a KPOD
+"""
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+from kpod_transport import KPODTransport, KPOD_USB_CMD_UPDATE, REPORT_LEN
+
+# File header: magic, format version, record size, wall-clock start (time.time())
+HEADER = struct.Struct("<8sHHd12x")
+MAGIC = b"KPODCAP\0"
+VERSION = 1
+
+# One report: read time in ns since capture start, write -> read round trip
+# in ns (saturating), raw 8-byte reply
+RECORD = struct.Struct("<qI8s")
+MAX_ROUND_TRIP = 0xFFFFFFFF
+
+
+class CaptureError(ValueError):
+    """A file is not a KPOD capture."""
+
+
+def device_capture_path(path, name):
+    """Per-device capture file when several KPODs are bridged: cap.kcap -> cap-NAME.kcap."""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{name}{ext}"
+
+
+class CaptureWriter:
+    """
+    Append raw KPOD reports to a capture file from a background thread.
+
+    add() packs one fixed-size record into the current chunk. Full chunks
+    are handed to the writer thread, so the poll loop never touches the
+    file; the writer also takes the current chunk itself every
+    flush_interval seconds, so the last events reach the disk even when
+    the station goes quiet or the bridge hangs. If the queue is full a
+    chunk is dropped and its records counted. By default only event
+    reports are kept; events_only=False also keeps empty polls, for poll
+    timing analysis.
+    """
+
+    def __init__(self, path, events_only=True, chunk_records=1024, flush_interval=1.0,
+                 queue_size=256):
+        self.path = path
+        self.events_only = events_only
+        self.chunk_bytes = chunk_records * RECORD.size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()  # Guards chunk: the writer thread hands it off too
+        self.chunk = bytearray()
+        self.t0_ns = time.perf_counter_ns()
+        self.records = 0
+        self.dropped = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time()))
+        self.file.flush()
+        self.thread = threading.Thread(target=self.writer, name="kpod-capture", daemon=True)
+        self.thread.start()
+
+    def add(self, t_write_ns, t_read_ns, report):
+        """Record one reply to a 'u' poll (no-op for timeouts and, by default, empty polls)."""
+        if not report or (self.events_only and report[0] != KPOD_USB_CMD_UPDATE):
+            return
+        round_trip = t_read_ns - t_write_ns
+        if round_trip > MAX_ROUND_TRIP:
+            round_trip = MAX_ROUND_TRIP
+        record = RECORD.pack(t_read_ns - self.t0_ns, max(round_trip, 0), bytes(report))
+        self.records += 1
+        with self.lock:
+            self.chunk += record
+            full = len(self.chunk) >= self.chunk_bytes
+        if full:
+            self.handoff()
+
+    def handoff(self):
+        """Pass the current chunk to the writer thread."""
+        # Queued under the lock, so chunks from both threads stay in order
+        with self.lock:
+            chunk, self.chunk = self.chunk, bytearray()
+            if not chunk:
+                return
+            try:
+                self.queue.put_nowait(chunk)
+            except queue.Full:
+                self.dropped += len(chunk) // RECORD.size
+
+    def writer(self):
+        """Writer thread: append chunks until close(), taking a partial one when idle."""
+        try:
+            while True:
+                try:
+                    chunk = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self.handoff()
+                    continue
+                if chunk is None:
+                    break
+                self.file.write(chunk)
+                if self.queue.empty():
+                    self.file.flush()
+        finally:
+            self.file.close()
+
+    def close(self, timeout=2.0):
+        """Write what is left and stop the writer thread."""
+        self.handoff()
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+
+class CaptureReader:
+    """
+    Memory-mapped view of a capture file.
+
+    Records are unpacked straight from the mapping on demand, so opening
+    an hour-long session costs nothing up front. A record cut short by a
+    crash at the end of the file is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise CaptureError(f"{path}: too short for a KPOD capture")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.started = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise CaptureError(f"{path}: not a KPOD capture")
+        if version != VERSION:
+            self.close()
+            raise CaptureError(f"{path}: unsupported capture version {version}")
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """(t_read_ns, round_trip_ns, report) of record index."""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def __iter__(self):
+        view = memoryview(self.map)[HEADER.size:HEADER.size + self.count * RECORD.size]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    @property
+    def duration(self):
+        """Seconds from capture start to the last record."""
+        return self[self.count - 1][0] / 1e9 if self.count else 0.0
+
+    def close(self):
+        self.map.close()
+
+
+class ReplayKPOD(KPODTransport):
+    """
+    KPOD transport that plays a capture back through the bridge.
+
+    Each 'u' poll returns the next captured report once it is due: at the
+    original timing scaled by speed, or immediately with speed 0 (as fast
+    as the bridge polls). Captured empty polls are skipped; the bridge's
+    own polls supply those. finished turns True after the last report.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.reader = None
+        self.index = 0
+        self.t_start = None
+        self.reply = None
+        self.name = f"replay of {os.path.basename(path)}"
+
+    @property
+    def finished(self):
+        return self.reader is not None and self.index >= len(self.reader)
+
+    def open(self):
+        if self.reader is None:
+            self.reader = CaptureReader(self.path)
+
+    def next_report(self):
+        """The next due event report, or None."""
+        reader = self.reader
+        while self.index < reader.count:
+            t_read_ns, _, report = reader[self.index]
+            if self.speed > 0:
+                if self.t_start is None:
+                    self.t_start = time.perf_counter_ns()
+                if (time.perf_counter_ns() - self.t_start) * self.speed < t_read_ns:
+                    return None
+            self.index += 1
+            if report[0] == KPOD_USB_CMD_UPDATE:
+                return report
+        return None
+
+    def write(self, packet):
+        if self.reader is None:
+            raise IOError("replay is not open")
+        cmd = packet[0]
+        reply = None
+        if cmd == KPOD_USB_CMD_UPDATE:
+            reply = self.next_report()
+        elif cmd == ord('='):
+            reply = bytes([cmd]) + b"REPLAY\0"
+        elif cmd == ord('v'):
+            reply = bytes([cmd]) + bytes(REPORT_LEN - 1)
+        self.reply = reply or bytes(REPORT_LEN)
+        return len(packet)
+
+    def read(self, size, timeout=None):
+        reply, self.reply = self.reply, None
+        return (reply or bytes(REPORT_LEN))[:size]
+
+    def close(self):
+        pass  # Keep the mapping and position across reconnects
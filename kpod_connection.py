@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Connection Supervisor
+Disconnect detection, reconnect back-off and time-to-recover bookkeeping
+"""
+
+import time
+
+
+class ConnectionSupervisor:
+    """
+    Decide when a KPOD link is lost and how long to wait between reconnects.
+
+    The worker reports failed polls: a transport error drops the link at
+    once, and max_timeouts timed-out reads in a row drop it too. While the
+    link is down, next_delay() returns the wait before the next reconnect
+    attempt, growing by backoff_factor from min_backoff up to max_backoff.
+    recovered() returns the outage length; outages up to rocker_hold seconds
+    keep the last rocker position, since nobody moved it during a cable bump.
+    """
+
+    def __init__(self, max_timeouts=5, min_backoff=0.05, max_backoff=1.0, backoff_factor=1.5,
+                 rocker_hold=10.0, clock=time.perf_counter_ns):
+        self.max_timeouts = max_timeouts
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff_factor = backoff_factor
+        self.rocker_hold = rocker_hold
+        self.clock = clock
+
+        self.timeouts = 0  # Timed-out reads in a row
+        self.last_timeout_poll = None
+        self.lost_ns = None  # When the link went down, None while connected
+        self.backoff = min_backoff
+        self.attempts = 0
+
+    @property
+    def connected(self):
+        return self.lost_ns is None
+
+    def timed_out(self, poll):
+        """Count a read that timed out on poll number poll; True if the link is now lost."""
+        # Polls that got a reply are not reported, so a gap in the poll
+        # numbers means the run of timeouts was broken
+        if self.last_timeout_poll is None or poll != self.last_timeout_poll + 1:
+            self.timeouts = 0
+        self.last_timeout_poll = poll
+        self.timeouts += 1
+        return self.timeouts >= self.max_timeouts
+
+    def lost(self, now_ns=None):
+        """Mark the link down and restart the back-off."""
+        if self.lost_ns is None:
+            self.lost_ns = self.clock() if now_ns is None else now_ns
+        self.backoff = self.min_backoff
+        self.attempts = 0
+        self.timeouts = 0
+        self.last_timeout_poll = None
+
+    def next_delay(self):
+        """Seconds to wait before the next reconnect attempt."""
+        delay = self.backoff
+        self.attempts += 1
+        self.backoff = min(self.max_backoff, self.backoff * self.backoff_factor)
+        return delay
+
+    def recovered(self, now_ns=None):
+        """Mark the link up again; returns (lost_ns, now_ns) of the outage."""
+        now_ns = self.clock() if now_ns is None else now_ns
+        lost_ns = self.lost_ns if self.lost_ns is not None else now_ns
+        self.lost_ns = None
+        return lost_ns, now_ns
+
+    def keeps_rocker(self, outage_ns):
+        """True if the rocker position can be trusted after an outage this long."""
+        return outage_ns <= self.rocker_hold * 1e9
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Precomputed Dispatch Tables
+Decode every controls byte once, up front, and prebuild the MIDI messages
+"""
+
+from collections import namedtuple
+
+# Rocker bits ((controls >> 5) & 3) that identify a position on their own.
+# Center (VFO B) reads as 0b00 and needs the poll context to be detected.
+ROCKER_FROM_BITS = {
+    0b10: "VFO A",      # Left rocker
+    0b01: "XIT/RIT",    # Right rocker
+}
+
+ROCKER_POSITIONS = ("VFO A", "VFO B", "XIT/RIT", "UNKNOWN")
+
+# Decoded controls byte: rocker position (or None), button bits, and for a
+# button event its number, TAP/HOLD, note, Note On/Off messages and log text
+ControlsEntry = namedtuple(
+    "ControlsEntry",
+    "rocker button_bits button_num tap_hold note messages action",
+)
+
+# Encoder notes, messages and log text for one rocker position
+EncoderEntry = namedtuple(
+    "EncoderEntry",
+    "cw_note ccw_note cw_messages ccw_messages cw_action ccw_action",
+)
+
+
+def note_messages(note, velocity=127, channel=0):
+    """Prebuilt (Note On, Note Off) pair for a note."""
+    channel &= 0x0F
+    return ((0x90 | channel, note, velocity), (0x80 | channel, note, 0))
+
+
+# Note On/Off pairs for every note at full velocity on channel 1
+NOTE_MESSAGES = tuple(note_messages(note) for note in range(128))
+
+
+def decode_controls(controls, tap_map, hold_map):
+    """
+    Reference decode of one controls byte.
+    Returns (rocker, button_bits, button_num, tap_hold, note).
+    """
+    rocker = ROCKER_FROM_BITS.get((controls >> 5) & 0x03)
+    button_bits = controls & 0x0F
+    button_num = tap_hold = note = None
+
+    # The low nibble is the button number itself, like the 0x41-0x48 map keys
+    if button_bits != 0:
+        button_num = button_bits
+        tap_hold = "HOLD" if (controls & 0x10) else "TAP"
+
+        if tap_hold == "TAP" and (0x40 | button_bits) in tap_map:
+            note = tap_map[0x40 | button_bits]
+        elif tap_hold == "HOLD" and (0x50 | button_bits) in hold_map:
+            note = hold_map[0x50 | button_bits]
+        else:
+            # Fallback mapping. Values 9-15 are no KPOD button; they keep
+            # the note of their lowest set bit, as the poll loop always sent.
+            base_note = 64 if tap_hold == "TAP" else 72
+            if button_bits <= 8:
+                note = base_note + button_bits - 1
+            else:
+                note = base_note + (button_bits & -button_bits).bit_length() - 1
+
+    return rocker, button_bits, button_num, tap_hold, note
+
+
+def build_dispatch_table(tap_map, hold_map, channel=0, rocker_maps=None):
+    """
+    Build the 256-entry controls byte table.
+    rocker_maps optionally gives {rocker: (tap_map, hold_map)} for buttons
+    pressed at that rocker position; the rocker is part of the controls byte.
+    """
+    table = []
+    for controls in range(256):
+        maps = (tap_map, hold_map)
+        if rocker_maps:
+            position = ROCKER_FROM_BITS.get((controls >> 5) & 0x03)
+            if position is None and (controls >> 5) & 0x03 == 0:
+                position = "VFO B"
+            maps = rocker_maps.get(position, maps)
+        rocker, button_bits, button_num, tap_hold, note = decode_controls(controls, *maps)
+        if note is not None:
+            messages = note_messages(note, channel=channel)
+            action = f"{tap_hold} Button {button_num} → Note {note}"
+        else:
+            messages = ()
+            action = None
+        table.append(ControlsEntry(rocker, button_bits, button_num, tap_hold,
+                                   note, messages, action))
+    return tuple(table)
+
+
+def build_encoder_table(encoder_notes, channel=0):
+    """
+    Build per-rocker encoder entries.
+    encoder_notes is a callable mapping a rocker position to (cw_note, ccw_note).
+    """
+    table = {}
+    for rocker in ROCKER_POSITIONS:
+        cw_note, ccw_note = encoder_notes(rocker)
+        table[rocker] = EncoderEntry(
+            cw_note, ccw_note,
+            note_messages(cw_note, channel=channel),
+            note_messages(ccw_note, channel=channel),
+            f"Encoder CW → Note {cw_note} (at {rocker})",
+            f"Encoder CCW → Note {ccw_note} (at {rocker})",
+        )
+    return table
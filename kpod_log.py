@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Activity Log
+Fixed-capacity ring buffer of log records with lazy formatting, level
+filtering, collapsing of repeated entries and background file output
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+}
+
+
+class LogRecord:
+    """One log entry; repeats of the same message bump count instead of adding records."""
+
+    __slots__ = ("seq", "timestamp", "level", "message", "count", "emitted")
+
+    def __init__(self, seq, timestamp, level, message, count=1):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.level = level
+        self.message = message
+        self.count = count
+        self.emitted = count  # Count the sinks have seen
+
+    def format(self, count=None):
+        """Format as a log line, e.g. '[12:00:01] INFO: Encoder CW → Note 100 ×37'."""
+        count = self.count if count is None else count
+        stamp = time.strftime("%H:%M:%S", time.localtime(self.timestamp))
+        repeat = f" ×{count}" if count > 1 else ""
+        return f"[{stamp}] {self.level}: {self.message}{repeat}\n"
+
+
+class ActivityLog:
+    """
+    Thread-safe ring buffer of LogRecords.
+
+    Records are numbered with an increasing seq; the newest capacity records
+    are kept in preallocated slots. Formatting happens only when a record is
+    displayed or written. Sinks see each new record once, and again with its
+    final count when a run of repeats ends.
+    """
+
+    def __init__(self, capacity=2000, level="INFO"):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.next_seq = 0
+        self.min_level = LEVELS[level]
+        self.sinks = []
+        self.lock = threading.Lock()
+
+    def set_level(self, level):
+        """Drop records below level from now on."""
+        self.min_level = LEVELS[level]
+
+    def add_sink(self, sink):
+        """Register an object with an emit(record, count) method."""
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def add(self, message, level="INFO", count=1):
+        """
+        Record a message count times in a row (e.g. once per encoder tick);
+        returns the (possibly collapsed) record or None if filtered.
+        """
+        if LEVELS.get(level, 0) < self.min_level:
+            return None
+        now = time.time()
+        closed = None
+        with self.lock:
+            last = self.slots[(self.next_seq - 1) % self.capacity] if self.next_seq else None
+            if last is not None and last.message == message and last.level == level:
+                last.count += count
+                return last
+            if last is not None and last.count > last.emitted:
+                closed = (last, last.count)
+                last.emitted = last.count
+            record = LogRecord(self.next_seq, now, level, message, count)
+            self.slots[self.next_seq % self.capacity] = record
+            self.next_seq += 1
+            # Emit under the lock so every sink sees records in seq order
+            for sink in self.sinks:
+                try:
+                    if closed:
+                        sink.emit(*closed)
+                    sink.emit(record, count)
+                except Exception:
+                    pass  # A broken sink must never stop the HID thread
+        return record
+
+    def flush(self):
+        """Report the repeat count of the current run to sinks."""
+        with self.lock:
+            last = self.slots[(self.next_seq - 1) % self.capacity] if self.next_seq else None
+            if last is not None and last.count > last.emitted:
+                last.emitted = last.count
+                for sink in self.sinks:
+                    try:
+                        sink.emit(last, last.count)
+                    except Exception:
+                        pass
+
+    def since(self, seq, level=None):
+        """Records newer than seq still in the buffer, optionally at or above level."""
+        min_level = LEVELS[level] if level else 0
+        with self.lock:
+            first = max(seq + 1, self.next_seq - self.capacity, 0)
+            records = [self.slots[s % self.capacity] for s in range(first, self.next_seq)]
+        if min_level:
+            records = [r for r in records if LEVELS.get(r.level, 0) >= min_level]
+        return records
+
+    def get(self, seq):
+        """Return the record with seq if it is still in the buffer."""
+        with self.lock:
+            if self.next_seq - self.capacity <= seq < self.next_seq and seq >= 0:
+                return self.slots[seq % self.capacity]
+        return None
+
+    @property
+    def last_seq(self):
+        return self.next_seq - 1
+
+
+class ConsoleSink:
+    """
+    Write log lines to a stream (stdout by default) from a background thread.
+
+    As with RotatingFileSink the caller only enqueues, so a slow terminal
+    or pipe never holds up the HID thread; if the queue is full, lines are
+    dropped and counted. After close(), lines are written directly.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        self.stream = stream or sys.stdout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.writer, name="kpod-console", daemon=True)
+        self.thread.start()
+
+    def emit(self, record, count):
+        if self.closed:
+            self.write([(record, count)])
+            return
+        try:
+            self.queue.put_nowait((record, count))
+        except queue.Full:
+            self.dropped += 1
+
+    def write(self, items):
+        self.stream.write("".join(record.format(count) for record, count in items))
+        self.stream.flush()
+
+    def drain(self):
+        """Everything already queued, up to a close() marker."""
+        items = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return items, False
+            if item is None:
+                return items, True
+            items.append(item)
+
+    def writer(self):
+        """Writer thread: write queued lines until close()."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            # One write and flush for whatever else is already queued
+            items, done = self.drain()
+            self.write([item] + items)
+            if done:
+                break
+
+    def close(self, timeout=1.0):
+        """Write queued lines and stop the writer thread."""
+        self.closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        items, _ = self.drain()  # Lines queued just before closed was set
+        if items:
+            self.write(items)
+
+
+class RotatingFileSink:
+    """
+    Append log lines to a file from a background thread.
+
+    The caller only enqueues (record, count); formatting and disk writes
+    happen on the writer thread. The file rotates to path.1 .. path.N when
+    it grows past max_bytes. If the queue is full, lines are dropped and
+    counted rather than blocking the caller.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024, backup_count=3, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.file = None
+        self.thread = threading.Thread(target=self.writer, name="kpod-log-writer", daemon=True)
+        self.thread.start()
+
+    def emit(self, record, count):
+        try:
+            self.queue.put_nowait((record, count))
+        except queue.Full:
+            self.dropped += 1
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def writer(self):
+        """Writer thread: drain the queue to disk until close()."""
+        self.file = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                record, count = item
+                self.file.write(record.format(count))
+                # Write whatever else is already queued before flushing
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        return
+                    record, count = item
+                    self.file.write(record.format(count))
+                self.file.flush()
+                if self.max_bytes and self.file.tell() >= self.max_bytes:
+                    self.rotate()
+        finally:
+            self.file.close()
+
+    def close(self, timeout=1.0):
+        """Flush queued lines and stop the writer thread."""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
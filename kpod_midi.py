@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - MIDI Message Encoding
+Coalesced encoder output: one relative CC or NRPN delta per poll
+"""
+
+# Encoder output modes
+ENCODER_MODE_NOTES = "notes"            # One Note On/Off pair per tick (original behaviour)
+ENCODER_MODE_CC_TWOS = "cc-twos"        # Relative CC, two's complement (1..63 CW, 127..65 CCW)
+ENCODER_MODE_CC_SIGNMAG = "cc-signmag"  # Relative CC, sign-magnitude (1..63 CW, 65..127 CCW)
+ENCODER_MODE_NRPN = "nrpn"              # 14-bit NRPN delta, offset binary around 8192
+
+ENCODER_MODES = (
+    ENCODER_MODE_NOTES,
+    ENCODER_MODE_CC_TWOS,
+    ENCODER_MODE_CC_SIGNMAG,
+    ENCODER_MODE_NRPN,
+)
+
+# Controller numbers for relative CC output (VFO A/B share one, like the notes)
+ENCODER_CC = {
+    "VFO": 16,
+    "XIT/RIT": 17,
+}
+
+# NRPN parameter numbers for 14-bit delta output
+ENCODER_NRPN = {
+    "VFO": 0x0000,
+    "XIT/RIT": 0x0001,
+}
+
+CC_MAX_DELTA = 63
+NRPN_MAX_DELTA = 8191
+NRPN_CENTER = 8192
+
+
+def encoder_group(rocker):
+    """Map a rocker position to its encoder controller group."""
+    return "XIT/RIT" if rocker == "XIT/RIT" else "VFO"
+
+
+def relative_cc_value(delta, mode):
+    """Encode a delta in [-63, 63] as a 7-bit relative CC value."""
+    if mode == ENCODER_MODE_CC_SIGNMAG:
+        return (0x40 | -delta) if delta < 0 else delta
+    return delta & 0x7F
+
+
+def split_delta(delta, limit):
+    """Split a signed delta into chunks no larger than limit."""
+    chunks = []
+    sign = 1 if delta > 0 else -1
+    remaining = abs(delta)
+    while remaining:
+        step = min(remaining, limit)
+        chunks.append(sign * step)
+        remaining -= step
+    return chunks
+
+
+def encoder_messages(mode, rocker, delta, channel=0, nrpn_selected=None):
+    """
+    Build the MIDI messages carrying a signed encoder delta.
+
+    Deltas too large for one message are split, so no ticks are lost. In NRPN
+    mode the parameter select (CC 99/98) is skipped when nrpn_selected says
+    the receiver already has that parameter selected.
+    Returns a list of raw MIDI messages (lists of ints).
+    """
+    group = encoder_group(rocker)
+    status = 0xB0 | (channel & 0x0F)
+    messages = []
+
+    if mode in (ENCODER_MODE_CC_TWOS, ENCODER_MODE_CC_SIGNMAG):
+        cc = ENCODER_CC[group]
+        for chunk in split_delta(delta, CC_MAX_DELTA):
+            messages.append([status, cc, relative_cc_value(chunk, mode)])
+
+    elif mode == ENCODER_MODE_NRPN:
+        param = ENCODER_NRPN[group]
+        for chunk in split_delta(delta, NRPN_MAX_DELTA):
+            value = NRPN_CENTER + chunk
+            if param != nrpn_selected:
+                messages.append([status, 99, (param >> 7) & 0x7F])   # NRPN MSB
+                messages.append([status, 98, param & 0x7F])          # NRPN LSB
+                nrpn_selected = param
+            messages.append([status, 6, (value >> 7) & 0x7F])    # Data Entry MSB
+            messages.append([status, 38, value & 0x7F])          # Data Entry LSB
+
+    else:
+        raise ValueError(f"Not a coalesced encoder mode: {mode}")
+
+    return messages
+
+
+def encoder_nrpn_param(rocker):
+    """NRPN parameter number used for the rocker position."""
+    return ENCODER_NRPN[encoder_group(rocker)]
+
+
+def describe_encoder_target(mode, rocker):
+    """Short label for log lines, e.g. 'CC 16' or 'NRPN 1'."""
+    group = encoder_group(rocker)
+    if mode == ENCODER_MODE_NRPN:
+        return f"NRPN {ENCODER_NRPN[group]}"
+    return f"CC {ENCODER_CC[group]}"
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Multiple KPODs
+One independent bridge per device, mapped to its own MIDI channel or port
+"""
+
+import json
+
+
+def parse_device_map(specs):
+    """
+    Parse --device-map entries of the form KEY=CHANNEL[@PORT].
+
+    KEY is a device serial number or its 1-based position; CHANNEL is the
+    MIDI channel 1-16; PORT is text contained in the output port name.
+    Returns {key: (channel 0-15, port or None)}.
+    """
+    mapping = {}
+    for spec in specs or ():
+        key, sep, target = spec.partition("=")
+        if not sep or not key:
+            raise ValueError(f"Bad device mapping '{spec}', expected KEY=CHANNEL[@PORT]")
+        channel, _, port = target.partition("@")
+        channel = int(channel)
+        if not 1 <= channel <= 16:
+            raise ValueError(f"MIDI channel must be 1-16 in '{spec}'")
+        mapping[key] = (channel - 1, port or None)
+    return mapping
+
+
+def device_target(mapping, index, transport, default_port=None):
+    """(channel, port, name) for the index-th device; unmapped devices get channel index + 1."""
+    serial = transport.serial
+    channel, port = mapping.get(serial) or mapping.get(str(index + 1)) or (index % 16, None)
+    name = serial or f"KPOD {index + 1}"
+    return channel, port or default_port, name
+
+
+class KPODGroup:
+    """
+    Several KPODBridges run side by side.
+
+    Every device has its own worker, poller, rocker state, MIDI sender,
+    output port and statistics, so one device's reads and sends never wait
+    on another's. The bridges share one activity log, with lines prefixed by
+    device name. The group offers the bridge calls front ends use.
+    """
+
+    def __init__(self, bridges, activity_log):
+        self.bridges = list(bridges)
+        self.activity_log = activity_log
+
+    def log_message(self, message, level="INFO"):
+        self.activity_log.add(message, level)
+
+    def watch_profile(self, path, interval=1.0):
+        """Load and watch a mapping profile for every device (each on its own channel)."""
+        results = [bridge.watch_profile(path, interval) for bridge in self.bridges]
+        return all(results)
+
+    def setup_midi(self):
+        """Open every device's MIDI output; True only if all succeeded."""
+        results = [bridge.setup_midi() for bridge in self.bridges]
+        return all(results)
+
+    def start(self):
+        started = [bridge.start() for bridge in self.bridges]
+        return any(started)
+
+    def stop(self):
+        stopped = [bridge.stop() for bridge in self.bridges]
+        return any(stopped)
+
+    def is_alive(self):
+        return any(bridge.is_alive() for bridge in self.bridges)
+
+    def close(self):
+        for bridge in self.bridges:
+            bridge.running = False
+        for bridge in self.bridges:
+            bridge.close()
+
+    def dump_stats(self, path):
+        """Write per-device statistics to path (.csv with a device column, or JSON)."""
+        try:
+            if path.lower().endswith(".csv"):
+                text = "".join(bridge.stats.to_csv(bridge.name, header=(i == 0))
+                               for i, bridge in enumerate(self.bridges))
+            else:
+                text = json.dumps({"devices": {bridge.name: bridge.stats.snapshot()
+                                               for bridge in self.bridges}}, indent=2)
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            self.log_message(f"Statistics written to {path}")
+            return True
+        except Exception as e:
+            self.log_message(f"Could not write statistics: {e}", "ERROR")
+            return False
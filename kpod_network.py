@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Network Output
+One UDP datagram (OSC bundle or compact binary) per KPOD report
+"""
+
+import argparse
+import queue
+import re
+import socket
+import struct
+import sys
+import threading
+
+FORMAT_OSC = "osc"
+FORMAT_BINARY = "udp"
+FORMATS = (FORMAT_OSC, FORMAT_BINARY)
+
+# OSC bundle header: "#bundle", then the "immediately" time tag
+OSC_BUNDLE = b"#bundle\0" + struct.pack(">Q", 1)
+
+# Binary datagram: magic, version, flags, sequence, ticks, rocker, button,
+# then the device name (UTF-8, may be empty)
+BINARY = struct.Struct("<2sBBIhBB")
+BINARY_MAGIC = b"KP"
+BINARY_VERSION = 1
+BINARY_MAX_TICKS = 32767  # Larger deltas are split over several datagrams,
+BINARY_MAX_PARTS = 8      # up to this many; beyond that the delta is clamped
+FLAG_ROCKER = 0x01  # Rocker moved in this report
+FLAG_TICKS = 0x02
+FLAG_BUTTON = 0x04
+FLAG_HOLD = 0x08    # Button event was a HOLD
+
+ROCKER_CODES = {"VFO A": 0, "VFO B": 1, "XIT/RIT": 2}
+ROCKER_NAMES = {code: name for name, code in ROCKER_CODES.items()}
+ROCKER_UNKNOWN = 255
+
+
+def osc_string(text):
+    """OSC string: UTF-8, NUL terminated, padded to a multiple of 4."""
+    data = text.encode("utf-8") + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def osc_message(address, *args):
+    """Encode an OSC message with int and string arguments."""
+    tags = "," + "".join("i" if isinstance(arg, int) else "s" for arg in args)
+    parts = [osc_string(address), osc_string(tags)]
+    for arg in args:
+        parts.append(struct.pack(">i", arg) if isinstance(arg, int) else osc_string(arg))
+    return b"".join(parts)
+
+
+def osc_name(device):
+    """Device name as one OSC address part: 'KPOD 1' -> 'kpod1'."""
+    return re.sub(r"[^a-z0-9_.-]", "", device.lower()) or "kpod"
+
+
+def osc_bundle(messages):
+    return OSC_BUNDLE + b"".join(struct.pack(">i", len(m)) + m for m in messages)
+
+
+def encode_osc(prefix, rocker, rocker_changed, ticks, button, tap_hold):
+    """One report as an OSC bundle of /rocker, /encoder and /button messages."""
+    messages = []
+    if rocker_changed:
+        messages.append(osc_message(prefix + "/rocker", rocker))
+    if ticks:
+        messages.append(osc_message(prefix + "/encoder", ticks))
+    if button:
+        messages.append(osc_message(prefix + "/button", button, tap_hold.lower()))
+    return osc_bundle(messages)
+
+
+def encode_binary(device, seq, rocker, rocker_changed, ticks, button, tap_hold):
+    """One report as a BINARY datagram."""
+    flags = ((FLAG_ROCKER if rocker_changed else 0) | (FLAG_TICKS if ticks else 0)
+             | (FLAG_BUTTON if button else 0) | (FLAG_HOLD if tap_hold == "HOLD" else 0))
+    return BINARY.pack(BINARY_MAGIC, BINARY_VERSION, flags, seq & 0xFFFFFFFF, ticks,
+                       ROCKER_CODES.get(rocker, ROCKER_UNKNOWN), button or 0) + device.encode("utf-8")
+
+
+def parse_sink_url(url):
+    """'osc://host:port' or 'udp://host:port' -> (format, host, port)."""
+    scheme, sep, address = url.partition("://")
+    host, colon, port = address.rpartition(":")
+    if not sep or scheme not in FORMATS or not colon or not host or not port.isdigit():
+        raise ValueError(f"Bad network output '{url}', expected osc://HOST:PORT or udp://HOST:PORT")
+    return scheme, host, int(port)
+
+
+class NetworkSink:
+    """
+    Send KPOD reports to a UDP listener from a background thread.
+
+    The bridge calls submit_report() once per report that changed
+    something. The rocker change, the signed tick delta and the button event
+    of that report go out together in one datagram: an OSC bundle, or a
+    BINARY record. The caller only enqueues; if the queue is full, or the
+    socket cannot take the datagram right away, it is dropped and counted.
+    """
+
+    def __init__(self, host, port, fmt=FORMAT_OSC, log=None, queue_size=1024):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown network format: {fmt}")
+        self.host, self.port = host, port
+        self.format = fmt
+        self.log = log or (lambda message, level="INFO": None)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        # Resolve once; sendto() with a host name would look it up per datagram
+        family, _, _, _, self.address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.thread = threading.Thread(target=self.sender, name="kpod-net-sender", daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"{self.format}://{self.host}:{self.port}"
+
+    def submit_report(self, device, rocker, rocker_changed, ticks, button, tap_hold):
+        """Queue one report; device is the bridge name or None."""
+        try:
+            self.queue.put_nowait((device, rocker, rocker_changed, ticks, button, tap_hold))
+        except queue.Full:
+            self.dropped += 1
+
+    def encode(self, device, rocker, rocker_changed, ticks, button, tap_hold):
+        """The datagrams for one report."""
+        if self.format == FORMAT_OSC:
+            prefix = f"/kpod/{osc_name(device)}" if device else "/kpod"
+            return [encode_osc(prefix, rocker, rocker_changed, ticks, button, tap_hold)]
+        datagrams = []
+        while True:
+            # The rocker and button go with the first part of the ticks
+            part = max(-BINARY_MAX_TICKS, min(BINARY_MAX_TICKS, ticks))
+            self.seq += 1
+            datagrams.append(encode_binary(device or "", self.seq, rocker, rocker_changed, part,
+                                           button, tap_hold))
+            ticks -= part
+            if not ticks or len(datagrams) == BINARY_MAX_PARTS:
+                return datagrams
+            rocker_changed, button, tap_hold = False, None, None
+
+    def error(self, e):
+        self.errors += 1
+        if self.errors == 1:
+            self.log(f"Network output {self.url}: {e}", "WARNING")
+
+    def sender(self):
+        """Sender thread: encode and send queued reports until close()."""
+        sock, address = self.sock, self.address
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                datagrams = self.encode(*item)
+            except Exception as e:
+                self.error(e)  # A bad report must never stop the sender thread
+                continue
+            for datagram in datagrams:
+                try:
+                    sock.sendto(datagram, address)
+                    self.sent += 1
+                except BlockingIOError:
+                    self.dropped += 1
+                except OSError as e:
+                    self.error(e)  # e.g. ICMP port unreachable reported on a later send
+
+    def close(self, timeout=1.0):
+        """Send what is queued and stop the sender thread."""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.sock.close()
+
+
+def decode_osc(data):
+    """List of (address, args) from an OSC bundle or message."""
+    if data.startswith(b"#bundle\0"):
+        messages, pos = [], 16
+        while pos < len(data):
+            size = struct.unpack_from(">i", data, pos)[0]
+            messages += decode_osc(data[pos + 4:pos + 4 + size])
+            pos += 4 + size
+        return messages
+
+    def read_string(pos):
+        end = data.index(b"\0", pos)
+        return data[pos:end].decode("utf-8"), end + 1 + (-(end + 1) % 4)
+
+    address, pos = read_string(0)
+    tags, pos = read_string(pos)
+    args = []
+    for tag in tags[1:]:
+        if tag == "i":
+            args.append(struct.unpack_from(">i", data, pos)[0])
+            pos += 4
+        else:
+            value, pos = read_string(pos)
+            args.append(value)
+    return [(address, args)]
+
+
+def decode_binary(data):
+    """Dict of the fields of a BINARY datagram."""
+    magic, version, flags, seq, ticks, rocker, button = BINARY.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("not a KPOD datagram")
+    return {
+        "device": data[BINARY.size:].decode("utf-8"),
+        "seq": seq,
+        "rocker": ROCKER_NAMES.get(rocker, "UNKNOWN"),
+        "rocker_changed": bool(flags & FLAG_ROCKER),
+        "ticks": ticks,
+        "button": button if flags & FLAG_BUTTON else None,
+        "hold": bool(flags & FLAG_HOLD),
+    }
+
+
+def main(argv=None):
+    """Print datagrams sent by a NetworkSink, for testing."""
+    parser = argparse.ArgumentParser(description="Listen for KPOD network output")
+    parser.add_argument("port", type=int, help="UDP port to listen on")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default 127.0.0.1)")
+    args = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((args.host, args.port))
+    print(f"Listening on {args.host}:{args.port}", flush=True)
+    try:
+        while True:
+            data, sender = sock.recvfrom(65536)
+            try:
+                if data.startswith(b"#bundle") or data.startswith(b"/"):
+                    decoded = decode_osc(data)
+                else:
+                    decoded = decode_binary(data)
+            except (ValueError, struct.error) as e:
+                decoded = f"undecodable datagram ({e})"
+            print(f"{sender[0]}:{sender[1]} {decoded}", flush=True)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Adaptive Poll Scheduler
+Tight polling while the KPOD is in use, exponential back-off when idle
+"""
+
+import time
+
+
+class AdaptivePoller:
+    """
+    Decide how long to wait between 'u' polls.
+
+    While the encoder or buttons are active the poller returns active_interval
+    (0 means back-to-back reads, paced only by the USB round trip). Once
+    nothing has happened for active_hold seconds the interval doubles on every
+    empty poll, starting at min_backoff, until it reaches idle_interval.
+    """
+
+    def __init__(self, active_interval=0.0, idle_interval=0.025, active_hold=0.25,
+                 min_backoff=0.0005, backoff_factor=2.0, clock=time.monotonic):
+        if idle_interval < active_interval:
+            raise ValueError("idle_interval must not be shorter than active_interval")
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.active_hold = active_hold
+        self.min_backoff = min_backoff
+        self.backoff_factor = backoff_factor
+        self.clock = clock
+
+        self.interval = idle_interval
+        self.last_activity = None
+
+        # Effective poll rate, recomputed once per rate_window
+        self.rate_window = 1.0
+        self.poll_rate = 0.0
+        self.window_start = None
+        self.window_polls = 0
+
+    def reset(self):
+        """Return to the idle state, e.g. when monitoring restarts."""
+        self.interval = self.idle_interval
+        self.last_activity = None
+        self.poll_rate = 0.0
+        self.window_start = None
+        self.window_polls = 0
+
+    def next_interval(self, active, now=None):
+        """Record one poll and return the delay before the next one."""
+        now = self.clock() if now is None else now
+
+        if active:
+            self.last_activity = now
+            self.interval = self.active_interval
+        elif self.last_activity is not None and now - self.last_activity < self.active_hold:
+            # Knob probably still moving; stay tight for a little while
+            self.interval = self.active_interval
+        elif self.interval < self.idle_interval:
+            self.interval = min(self.idle_interval,
+                                max(self.min_backoff, self.interval * self.backoff_factor))
+
+        return self.interval
+
+    def update_rate(self, now=None):
+        """Count one poll; return True when poll_rate was recomputed."""
+        now = self.clock() if now is None else now
+        if self.window_start is None:
+            self.window_start = now
+        self.window_polls += 1
+        elapsed = now - self.window_start
+        if elapsed >= self.rate_window:
+            self.poll_rate = self.window_polls / elapsed
+            self.window_start = now
+            self.window_polls = 0
+            return True
+        return False
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - HID Poll Process
+Optional child process for the HID loop, feeding a shared-memory event ring
+"""
+
+import multiprocessing
+import signal
+import struct
+from multiprocessing import shared_memory
+
+
+# Ring header, then capacity fixed-size records:
+#   0  write_seq   Q  records written by the child
+#   8  read_seq    Q  records consumed by the parent
+#   16 waiting     B  parent is blocked in wait()
+#   24 counters    QQQQQQQ  polls, empty_polls, errors, dropped, hid_timeouts,
+#                           disconnects, reconnects (child side)
+WRITE_SEQ = struct.Struct("<Q")
+READ_SEQ = struct.Struct("<Q")
+WAITING = struct.Struct("<B")
+COUNTERS = struct.Struct("<QQQQQQQ")
+WRITE_SEQ_OFFSET = 0
+READ_SEQ_OFFSET = 8
+WAITING_OFFSET = 16
+COUNTERS_OFFSET = 24
+HEADER_SIZE = 128
+
+# PipelineStats counter each ring counter is folded into
+COUNTER_NAMES = ("polls", "empty_polls", "errors", "hid_drops", "hid_timeouts",
+                 "disconnects", "reconnects")
+
+# One event report: poll write time, report read time (perf_counter_ns), ticks,
+# controls, flags
+RECORD = struct.Struct("<qqhBB4x")
+FLAG_ROCKER_RESET = 0x01  # Marker, not a report: forget the rocker position
+
+DEFAULT_CAPACITY = 4096
+
+
+class SharedEventRing:
+    """
+    Single-producer, single-consumer ring of event reports in shared memory.
+
+    The child process appends records and publishes them by advancing
+    write_seq; the parent unpacks them straight from the buffer and advances
+    read_seq. Each side only writes its own index, so no lock is needed and
+    nothing is pickled. A full ring drops the new record and counts it.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None, wakeup=None):
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * RECORD.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.buf = self.shm.buf
+        self.wakeup = wakeup  # multiprocessing.Event set when the parent waits
+        self.write_seq = WRITE_SEQ.unpack_from(self.buf, WRITE_SEQ_OFFSET)[0]
+        self.read_seq = READ_SEQ.unpack_from(self.buf, READ_SEQ_OFFSET)[0]
+        self.dropped = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def put(self, t_write, t_read, ticks, controls, flags=0):
+        """Producer: append one record; returns False if the ring was full."""
+        buf = self.buf
+        write_seq = self.write_seq
+        if write_seq - READ_SEQ.unpack_from(buf, READ_SEQ_OFFSET)[0] >= self.capacity:
+            self.dropped += 1
+            return False
+        RECORD.pack_into(buf, HEADER_SIZE + (write_seq % self.capacity) * RECORD.size,
+                         t_write, t_read, ticks, controls, flags)
+        # Publish only after the record is complete
+        self.write_seq = write_seq + 1
+        WRITE_SEQ.pack_into(buf, WRITE_SEQ_OFFSET, self.write_seq)
+        if self.wakeup is not None and buf[WAITING_OFFSET]:
+            self.wakeup.set()
+        return True
+
+    def publish_counters(self, stats):
+        """Producer: expose the child's poll and connection counters to the parent."""
+        COUNTERS.pack_into(self.buf, COUNTERS_OFFSET, stats.polls, stats.empty_polls,
+                           stats.errors, self.dropped, stats.hid_timeouts,
+                           stats.disconnects, stats.reconnects)
+
+    def counters(self):
+        """Consumer: the child's counters, in COUNTERS order."""
+        return COUNTERS.unpack_from(self.buf, COUNTERS_OFFSET)
+
+    def available(self):
+        return WRITE_SEQ.unpack_from(self.buf, WRITE_SEQ_OFFSET)[0] - self.read_seq
+
+    def get_all(self):
+        """Consumer: return every pending record as a tuple and release them."""
+        buf = self.buf
+        write_seq = WRITE_SEQ.unpack_from(buf, WRITE_SEQ_OFFSET)[0]
+        read_seq = self.read_seq
+        if write_seq == read_seq:
+            return []
+        capacity = self.capacity
+        unpack_from = RECORD.unpack_from
+        records = [unpack_from(buf, HEADER_SIZE + (seq % capacity) * RECORD.size)
+                   for seq in range(read_seq, write_seq)]
+        self.read_seq = write_seq
+        READ_SEQ.pack_into(buf, READ_SEQ_OFFSET, write_seq)
+        return records
+
+    def wait(self, timeout):
+        """Consumer: block until records are pending or timeout expires."""
+        if self.available() or self.wakeup is None:
+            return self.available() > 0
+        self.wakeup.clear()
+        WAITING.pack_into(self.buf, WAITING_OFFSET, 1)
+        try:
+            if not self.available():
+                self.wakeup.wait(timeout)
+        finally:
+            WAITING.pack_into(self.buf, WAITING_OFFSET, 0)
+        return self.available() > 0
+
+    def close(self):
+        """Detach; the creating side also frees the block."""
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ForwardingSink:
+    """Activity log sink that forwards records, and later repeats of them, to the parent process."""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.seq = None
+        self.sent = 0  # Repeats of record seq already forwarded
+
+    def emit(self, record, count):
+        sent = self.sent if record.seq == self.seq else 0
+        if count > sent:
+            self.outbox.put(("LOG", record.message, record.level, count - sent))
+        self.seq, self.sent = record.seq, max(count, sent)
+
+
+def hid_process_main(ring_name, capacity, wakeup, outbox, stop, transport, poller,
+                     reconnect=True):
+    """Child process: poll the KPOD and write event reports into the ring."""
+    from kpod_bridge import KPODBridge  # Imported here to avoid a cycle
+
+    # Ctrl+C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = SharedEventRing(capacity, ring_name, wakeup)
+    bridge = KPODBridge(transport, poller, reconnect=reconnect)
+    bridge.activity_log.add_sink(ForwardingSink(outbox))
+
+    def forward(message):
+        if message[0] == "ROCKER":
+            # Only a reset after a long outage gets here; the ring keeps it
+            # in order with the reports around it
+            ring.put(0, 0, 0, 0, FLAG_ROCKER_RESET)
+        else:
+            outbox.put(message)  # STATUS tuples
+
+    bridge.add_listener(forward)
+    # Event reports go to the ring; the parent decodes them
+    bridge.report_handler = lambda ticks, controls: ring.put(
+        bridge.last_write_ns, bridge.last_read_ns, ticks, controls)
+
+    if not bridge.begin_polling():
+        ring.close()
+        return
+
+    stats = bridge.stats
+    try:
+        while not stop.is_set():
+            delay = bridge.poll_step()
+            ring.publish_counters(stats)
+            if delay is None:
+                if transport.finished:
+                    outbox.put(("DONE",))  # After the last ring record
+                break
+            if delay > 0:
+                stop.wait(delay)
+    except Exception as e:
+        bridge.log_message(f"HID process error: {e}", "ERROR")
+    finally:
+        bridge.cleanup_hid()
+        ring.close()
+
+
+class HIDProcess:
+    """
+    Parent-side handle for the HID poll process.
+
+    start() creates the ring and spawns the child with the (unopened)
+    transport and poller; read() waits for and returns pending records;
+    messages() returns log, status and end-of-replay tuples the child has sent.
+    """
+
+    def __init__(self, transport, poller, capacity=DEFAULT_CAPACITY, reconnect=True):
+        self.transport = transport
+        self.poller = poller
+        self.capacity = capacity
+        self.reconnect = reconnect
+        # Spawn rather than fork: the parent already runs Tk and MIDI threads
+        self.context = multiprocessing.get_context("spawn")
+        self.ring = None
+        self.process = None
+        self.outbox = None
+        self.stop_event = None
+        self.seen = (0,) * len(COUNTER_NAMES)  # Child counters already folded into stats
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def start(self):
+        ctx = self.context
+        wakeup = ctx.Event()
+        self.ring = SharedEventRing(self.capacity, wakeup=wakeup)
+        self.outbox = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.seen = (0,) * len(COUNTER_NAMES)
+        self.process = ctx.Process(
+            target=hid_process_main, name="kpod-hid",
+            args=(self.ring.name, self.capacity, wakeup, self.outbox, self.stop_event,
+                  self.transport, self.poller, self.reconnect),
+            daemon=True)
+        self.process.start()
+
+    def is_alive(self):
+        return bool(self.process and self.process.is_alive())
+
+    def read(self, timeout=0.1):
+        """Wait up to timeout for event records and return them."""
+        if self.ring.wait(timeout):
+            return self.ring.get_all()
+        return []
+
+    def messages(self):
+        """Drain log, status and DONE tuples sent by the child."""
+        items = []
+        while True:
+            try:
+                items.append(self.outbox.get_nowait())
+            except Exception:  # queue.Empty
+                return items
+
+    def update_stats(self, stats):
+        """Add the child's new polls, errors, drops and reconnects to stats."""
+        counters = self.ring.counters()
+        for name, now, before in zip(COUNTER_NAMES, counters, self.seen):
+            if now != before:
+                setattr(stats, name, getattr(stats, name) + now - before)
+        self.seen = counters
+
+    def stop(self, timeout=2.0):
+        """Stop the child and free the ring."""
+        if self.stop_event:
+            self.stop_event.set()
+        if self.process:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+            self.process = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Mapping Profiles
+Load JSON/TOML mapping files, validate them and compile them into flat tables
+"""
+
+import copy
+import json
+import os
+import threading
+from collections import namedtuple
+
+from kpod_dispatch import build_dispatch_table, build_encoder_table, note_messages
+
+RANGED_POSITIONS = ("VFO A", "VFO B", "XIT/RIT")
+BUTTONS = range(1, 9)
+
+# Everything the poll loop needs from a profile, prebuilt for one MIDI channel.
+# Swapping the whole tuple is a single attribute store, so the worker always
+# sees one consistent profile.
+CompiledProfile = namedtuple(
+    "CompiledProfile",
+    "name source dispatch encoder_table rocker_notes rocker_messages",
+)
+
+
+class ProfileError(ValueError):
+    """A mapping profile is malformed."""
+
+
+def load_profile_file(path):
+    """Read a .json or .toml profile into a dict."""
+    if path.lower().endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ProfileError("TOML profiles need Python 3.11+ or the tomli package")
+        with open(path, "rb") as f:
+            try:
+                return tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ProfileError(f"{path}: {e}")
+    with open(path, encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ProfileError(f"{path}: {e}")
+
+
+def check_note(value, where):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 127:
+        raise ProfileError(f"{where}: MIDI note must be an integer 0-127, got {value!r}")
+    return value
+
+
+def check_buttons(section, where):
+    """Validate a {button: note} table and return it keyed by button bits."""
+    if not isinstance(section, dict):
+        raise ProfileError(f"{where}: expected a table of button = note")
+    buttons = {}
+    for key, note in section.items():
+        try:
+            button = int(key)
+        except (TypeError, ValueError):
+            button = None
+        if button not in BUTTONS:
+            raise ProfileError(f"{where}: button must be 1-8, got {key!r}")
+        buttons[button] = check_note(note, f"{where}.{key}")
+    return buttons
+
+
+def check_positions(section, where):
+    if not isinstance(section, dict):
+        raise ProfileError(f"{where}: expected a table keyed by rocker position")
+    for position in section:
+        if position not in RANGED_POSITIONS:
+            raise ProfileError(f"{where}: unknown rocker position {position!r}")
+    return section
+
+
+def merge_profile(base, data):
+    """Overlay a profile dict on base; sections missing from data keep base values."""
+    if not isinstance(data, dict):
+        raise ProfileError("profile must be a table")
+    unknown = set(data) - {"name", "tap", "hold", "rocker", "encoder", "positions"}
+    if unknown:
+        raise ProfileError(f"unknown profile keys: {', '.join(sorted(unknown))}")
+    merged = copy.deepcopy(base)
+    merged["name"] = str(data.get("name", merged.get("name", "profile")))
+    for section in ("tap", "hold", "rocker", "encoder"):
+        if section in data:
+            if not isinstance(data[section], dict):
+                raise ProfileError(f"{section}: expected a table")
+            merged.setdefault(section, {}).update(data[section])
+    for position, maps in check_positions(data.get("positions", {}), "positions").items():
+        if not isinstance(maps, dict) or set(maps) - {"tap", "hold"}:
+            raise ProfileError(f"positions.{position}: only tap and hold tables are allowed")
+        target = merged.setdefault("positions", {}).setdefault(position, {})
+        for kind, table in maps.items():
+            target[kind] = table
+    return merged
+
+
+def compile_profile(data, channel=0, source=None):
+    """Validate a complete profile dict and build its lookup tables for channel."""
+    tap = check_buttons(data.get("tap", {}), "tap")
+    hold = check_buttons(data.get("hold", {}), "hold")
+
+    rocker_notes = {}
+    for position, note in check_positions(data.get("rocker", {}), "rocker").items():
+        rocker_notes[position] = check_note(note, f"rocker.{position}")
+
+    encoder_notes = {}
+    for position, notes in check_positions(data.get("encoder", {}), "encoder").items():
+        if not isinstance(notes, (list, tuple)) or len(notes) != 2:
+            raise ProfileError(f"encoder.{position}: expected [cw_note, ccw_note]")
+        encoder_notes[position] = tuple(check_note(n, f"encoder.{position}") for n in notes)
+    if "VFO B" not in encoder_notes:
+        raise ProfileError("encoder: a VFO B entry is required")
+
+    # Per-position button tables, keyed as the dispatch table expects (0x40/0x50 | bits)
+    tap_map = {0x40 | button: note for button, note in tap.items()}
+    hold_map = {0x50 | button: note for button, note in hold.items()}
+    rocker_maps = {}
+    for position, maps in check_positions(data.get("positions", {}), "positions").items():
+        position_tap = dict(tap_map)
+        position_hold = dict(hold_map)
+        position_tap.update((0x40 | b, n) for b, n in
+                            check_buttons(maps.get("tap", {}), f"positions.{position}.tap").items())
+        position_hold.update((0x50 | b, n) for b, n in
+                             check_buttons(maps.get("hold", {}), f"positions.{position}.hold").items())
+        rocker_maps[position] = (position_tap, position_hold)
+
+    return CompiledProfile(
+        name=data.get("name", "profile"),
+        source=source,
+        dispatch=build_dispatch_table(tap_map, hold_map, channel, rocker_maps),
+        # Before the rocker is detected the encoder behaves as at VFO B
+        encoder_table=build_encoder_table(
+            lambda rocker: encoder_notes.get(rocker, encoder_notes["VFO B"]), channel),
+        rocker_notes=rocker_notes,
+        rocker_messages={position: note_messages(note, channel=channel)
+                         for position, note in rocker_notes.items()},
+    )
+
+
+class ProfileWatcher:
+    """
+    Recompile a profile file whenever it changes.
+
+    A background thread checks the file's modification time every interval
+    seconds. On a change the file is loaded, merged over base and compiled,
+    and on_load(compiled) is called; a file that fails to load is reported
+    through log and the previous profile stays in use.
+    """
+
+    def __init__(self, path, base, on_load, channel=0, log=None, interval=1.0):
+        self.path = path
+        self.base = base
+        self.on_load = on_load
+        self.channel = channel
+        self.log = log or (lambda message, level="INFO": None)
+        self.interval = interval
+        self.mtime = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def load(self):
+        """Compile the file now; returns the CompiledProfile or None on error."""
+        try:
+            self.mtime = os.stat(self.path).st_mtime_ns
+            data = merge_profile(self.base, load_profile_file(self.path))
+            compiled = compile_profile(data, self.channel, self.path)
+        except (OSError, ProfileError) as e:
+            self.log(f"Profile not loaded: {e}", "ERROR")
+            return None
+        self.on_load(compiled)
+        return compiled
+
+    def start(self):
+        if self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.watch, name="kpod-profile", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(self.interval + 1)
+            self.thread = None
+
+    def watch(self):
+        """Watcher thread: reload on modification time changes."""
+        while not self.stop_event.wait(self.interval):
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                continue  # Editors may replace the file; try again next time
+            if mtime != self.mtime:
+                self.load()
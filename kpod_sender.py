@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - MIDI Sender Thread
+Bounded ring buffer between the HID poll loop and a dedicated MIDI thread
+"""
+
+import threading
+import time
+from collections import deque
+
+from kpod_midi import encoder_messages, encoder_nrpn_param, ENCODER_MODE_NRPN
+
+# Ring items: (kind, key, amount, t_read_ns)
+#   ITEM_MESSAGES: key = tuple of prebuilt MIDI messages, amount = repeat count
+#   ITEM_DELTA:    key = (encoder_mode, rocker, channel), amount = signed ticks
+ITEM_MESSAGES = 0
+ITEM_DELTA = 1
+
+# What submit() does when the ring is full
+OVERFLOW_BLOCK = "block"              # Wait for the sender to make room
+OVERFLOW_DROP_OLDEST = "drop-oldest"  # Discard the oldest queued item
+OVERFLOW_MERGE = "merge"              # Fold into the newest item if it has the same key,
+                                      # otherwise drop the oldest
+
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_MERGE)
+
+
+class MidiSender:
+    """
+    Send MIDI from a dedicated thread.
+
+    The poll loop submits items into a bounded deque, which CPython appends
+    and pops atomically, so the producer never takes a lock. The sender
+    thread drains it to output.send_message and records the midi and total
+    latency stages. Queue depth, drops and merges are kept in stats.
+
+    The ring is a deque with a capacity check rather than a preallocated
+    array: a fixed array would need a lock or separate read and write
+    indices, while the deque stays lock-free and reuses its freed 64-item
+    blocks, so a steady queue allocates little beyond the item tuples.
+    """
+
+    def __init__(self, stats, log=None, capacity=1024, policy=OVERFLOW_MERGE):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.stats = stats
+        self.log = log or (lambda message, level="INFO": None)
+        self.capacity = capacity
+        self.policy = policy
+        self.ring = deque()
+        self.output = None
+        self.nrpn_selected = None  # NRPN parameter the receiver has selected
+        self.on_first_send = None  # Called once after the first message goes out
+
+        self.running = False
+        self.thread = None
+        self.idle = False
+        self.wakeup = threading.Event()
+        self.space = threading.Event()
+
+    @property
+    def depth(self):
+        return len(self.ring)
+
+    def set_output(self, output):
+        """Point the sender at an open MIDI output (or None)."""
+        self.output = output
+        self.nrpn_selected = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.sender_loop, name="kpod-midi-sender", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        """Send what is queued, then stop the thread."""
+        self.running = False
+        self.wakeup.set()
+        self.space.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def submit_messages(self, messages, count=1, t_read=0):
+        """Queue prebuilt messages to be sent count times."""
+        self.submit((ITEM_MESSAGES, messages, count, t_read))
+
+    def submit_delta(self, mode, rocker, channel, ticks, t_read=0):
+        """Queue a coalesced encoder delta."""
+        self.submit((ITEM_DELTA, (mode, rocker, channel), ticks, t_read))
+
+    def submit(self, item):
+        ring = self.ring
+        if len(ring) >= self.capacity:
+            if not self.make_room(item):
+                return
+        ring.append(item)
+        depth = len(ring)
+        if depth > self.stats.midi_queue_max:
+            self.stats.midi_queue_max = depth
+        if self.idle:
+            self.wakeup.set()
+
+    def make_room(self, item):
+        """Apply the overflow policy; return False if item was absorbed."""
+        ring = self.ring
+        stats = self.stats
+
+        if self.policy == OVERFLOW_BLOCK:
+            while len(ring) >= self.capacity and self.running:
+                self.space.clear()
+                if len(ring) < self.capacity:
+                    break
+                self.space.wait(0.01)
+            return True
+
+        if self.policy == OVERFLOW_MERGE:
+            # Only this thread appends, so ring[-1] stays the same item unless
+            # the sender drains the whole ring in between; then the read or
+            # the replace raises IndexError and item is simply appended
+            try:
+                kind, key, amount, t_read = ring[-1]
+                if kind == item[0] and key == item[1]:
+                    ring[-1] = (kind, key, amount + item[2], t_read)
+                    stats.midi_merges += 1
+                    return False
+            except IndexError:
+                return True
+
+        try:
+            ring.popleft()
+            stats.midi_drops += 1
+        except IndexError:
+            pass
+        return True
+
+    def send_item(self, item):
+        kind, key, amount, t_read = item
+        output = self.output
+        if output is None:
+            return
+        if kind == ITEM_DELTA:
+            mode, rocker, channel = key
+            messages = encoder_messages(mode, rocker, amount, channel, self.nrpn_selected)
+            count = 1
+        else:
+            messages, count = key, amount
+
+        t_start = time.perf_counter_ns()
+        send_message = output.send_message
+        for _ in range(count):
+            for message in messages:
+                send_message(message)
+        t_end = time.perf_counter_ns()
+
+        if kind == ITEM_DELTA and mode == ENCODER_MODE_NRPN:
+            self.nrpn_selected = encoder_nrpn_param(rocker)
+        stats = self.stats
+        stats.midi_messages += len(messages) * count
+        stats.record("midi", t_start, t_end)
+        if t_read:
+            stats.record("total", t_read, t_end)
+        if self.on_first_send:
+            hook, self.on_first_send = self.on_first_send, None
+            hook()
+
+    def sender_loop(self):
+        """Sender thread: drain the ring until stopped and empty."""
+        ring = self.ring
+        while True:
+            try:
+                item = ring.popleft()
+            except IndexError:
+                if not self.running:
+                    break
+                self.wakeup.clear()
+                self.idle = True
+                if not ring:
+                    self.wakeup.wait(0.1)
+                self.idle = False
+                continue
+
+            if self.policy == OVERFLOW_BLOCK:
+                self.space.set()
+            try:
+                self.send_item(item)
+            except Exception as e:
+                self.stats.errors += 1
+                self.log(f"MIDI send error: {e}", "ERROR")
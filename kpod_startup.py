@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Fast Start
+Startup cache, MIDI port matching and a time-to-first-MIDI-event report
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# Name of the virtual output port created when nothing matches on Linux
+VIRTUAL_PORT_NAME = "KPOD Bridge"
+
+
+def default_cache_path():
+    """Per-user cache file, e.g. ~/.cache/kpod-bridge/startup.json."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "kpod-bridge", "startup.json")
+
+
+def default_port_pattern():
+    """Port to look for when none is configured: the IAC Driver on macOS."""
+    return "IAC" if sys.platform == "darwin" else None
+
+
+def port_matches(name, pattern):
+    """True if pattern is the port name, a substring of it or a regex found in it."""
+    if pattern is None:
+        return True
+    if pattern == name or pattern in name:
+        return True
+    try:
+        return re.search(pattern, name, re.IGNORECASE) is not None
+    except re.error:
+        return False
+
+
+def find_port(ports, pattern=None, preferred=None):
+    """
+    Index of the output port to open, or None.
+    The cached port name is tried first if it still matches pattern.
+    """
+    if preferred in ports and port_matches(preferred, pattern):
+        return ports.index(preferred)
+    if pattern is None:
+        return None  # Nothing configured: leave the choice to the caller
+    for i, name in enumerate(ports):
+        if port_matches(name, pattern):
+            return i
+    return None
+
+
+class StartupCache:
+    """
+    Small JSON file remembering the last working MIDI port.
+
+    Entries are keyed by device name ("default" for a single KPOD). A
+    missing or unreadable file is an empty cache; write errors are ignored,
+    the cache only saves time.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.lock = threading.Lock()
+        self.data = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def get(self, section, key):
+        return self.data.get(section, {}).get(key)
+
+    def set(self, section, key, value):
+        """Store a value and write the file if it changed."""
+        with self.lock:
+            entries = self.data.setdefault(section, {})
+            if entries.get(key) == value:
+                return
+            entries[key] = value
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, indent=2)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+
+
+class StartupTimer:
+    """
+    Milestones from process start to the first MIDI event.
+
+    mark() records the first time each milestone is reached, in ms since
+    t0. The report is logged once the first MIDI message has gone out.
+    """
+
+    def __init__(self, t0=None, log=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.log = log or (lambda message, level="INFO": None)
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        """Record milestone name; returns False if it was already reached."""
+        with self.lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = (time.perf_counter() - self.t0) * 1000.0
+            return True
+
+    def report(self):
+        """Milestones as 'name 12.3 ms' text, in the order reached."""
+        with self.lock:
+            items = sorted(self.marks.items(), key=lambda item: item[1])
+        return ", ".join(f"{name} {ms:.1f} ms" for name, ms in items)
+
+    def first_midi_event(self):
+        """MidiSender hook: mark the first send and log the report."""
+        if self.mark("first MIDI event"):
+            self.log(f"Startup: {self.report()}")
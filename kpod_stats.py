@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - Pipeline Statistics
+Rolling latency histograms and counters for the HID to MIDI path
+"""
+
+import csv
+import io
+import json
+import time
+
+# Log-linear buckets: 4 sub-buckets per power of two, ~25% resolution.
+# Values are nanoseconds; 2**40 ns is about 18 minutes.
+SUB_BUCKET_BITS = 2
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_BITS = 40
+NUM_BUCKETS = (MAX_BITS + 1) * SUB_BUCKETS
+
+# Pipeline stages, in order
+STAGES = (
+    "write",    # Command write to the KPOD
+    "read",     # Wait for the report after the write
+    "poll",     # Full 'u' round trip (write + read)
+    "decode",   # Report returned -> decoded, ready to send
+    "midi",     # One batch of MIDI sends on the sender thread
+    "total",    # Report returned -> last MIDI message sent
+    "recover",  # KPOD connection lost -> reopened
+)
+
+COUNTERS = ("polls", "events", "empty_polls", "errors", "midi_messages",
+            "midi_drops", "midi_merges", "midi_queue_max", "hid_drops",
+            "hid_timeouts", "disconnects", "reconnects")
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(value):
+    """Histogram bucket for a non-negative integer value."""
+    if value < SUB_BUCKETS:
+        return value
+    bits = value.bit_length()
+    if bits > MAX_BITS:
+        return NUM_BUCKETS - 1
+    sub = (value >> (bits - SUB_BUCKET_BITS - 1)) & (SUB_BUCKETS - 1)
+    return (bits - SUB_BUCKET_BITS) * SUB_BUCKETS + sub
+
+
+def bucket_upper(index):
+    """Largest value that falls in bucket index."""
+    if index < SUB_BUCKETS:
+        return index
+    bits = index // SUB_BUCKETS + SUB_BUCKET_BITS
+    sub = index % SUB_BUCKETS
+    shift = bits - SUB_BUCKET_BITS - 1
+    return ((SUB_BUCKETS | sub) << shift) + (1 << shift) - 1
+
+
+def bucket_value(index):
+    """Representative (midpoint) value of bucket index."""
+    lower = bucket_upper(index - 1) + 1 if index else 0
+    return (lower + bucket_upper(index)) // 2
+
+
+class LatencyHistogram:
+    """
+    Rolling latency histogram.
+
+    Samples go into the current window's preallocated buckets; when the
+    window expires it becomes the previous window and a fresh one starts.
+    Percentiles are read from both, so they cover the last one to two
+    windows. Recording is a bit_length() and a list increment.
+    """
+
+    def __init__(self, window=10.0):
+        self.window_ns = int(window * 1e9)
+        self.current = [0] * NUM_BUCKETS
+        self.previous = [0] * NUM_BUCKETS
+        self.window_start = None
+        self.max_ns = 0
+        self.count = 0
+
+    def reset(self):
+        self.current = [0] * NUM_BUCKETS
+        self.previous = [0] * NUM_BUCKETS
+        self.window_start = None
+        self.max_ns = 0
+        self.count = 0
+
+    def record(self, ns, now_ns):
+        """Add one sample of ns nanoseconds taken at now_ns (perf_counter_ns)."""
+        if self.window_start is None:
+            self.window_start = now_ns
+        elif now_ns - self.window_start >= self.window_ns:
+            self.previous = self.current
+            self.current = [0] * NUM_BUCKETS
+            self.window_start = now_ns
+        if ns < 0:
+            ns = 0
+        self.current[bucket_index(ns)] += 1
+        self.count += 1
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """Return {p: estimated ns} over the rolling window."""
+        buckets = [a + b for a, b in zip(self.current, self.previous)]
+        total = sum(buckets)
+        result = {}
+        if not total:
+            return {p: 0 for p in percentiles}
+        for p in percentiles:
+            target = total * p / 100.0
+            seen = 0
+            for index, n in enumerate(buckets):
+                seen += n
+                if n and seen >= target:
+                    result[p] = min(bucket_value(index), self.max_ns)
+                    break
+        return result
+
+    def summary(self):
+        """Percentiles, max and count, all in microseconds except count."""
+        result = {f"p{p}_us": round(ns / 1000.0, 1) for p, ns in self.percentiles().items()}
+        result["max_us"] = round(self.max_ns / 1000.0, 1)
+        result["count"] = self.count
+        return result
+
+
+class PipelineStats:
+    """Per-stage latency histograms plus pipeline counters."""
+
+    def __init__(self, window=10.0):
+        self.histograms = {stage: LatencyHistogram(window) for stage in STAGES}
+        self.started = time.time()
+        self.polls = 0
+        self.events = 0
+        self.empty_polls = 0
+        self.errors = 0
+        self.midi_messages = 0
+        self.midi_drops = 0       # Items discarded by the sender overflow policy
+        self.midi_merges = 0      # Items folded into a queued one on overflow
+        self.midi_queue_max = 0   # Sender queue high-water mark
+        self.hid_drops = 0        # Reports lost to a full HID process ring
+        self.hid_timeouts = 0     # Polls with no reply within the read timeout
+        self.disconnects = 0      # KPOD connection lost
+        self.reconnects = 0       # KPOD reopened after a loss
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.started = time.time()
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+    def record(self, stage, start_ns, end_ns):
+        """Record one stage duration from two perf_counter_ns timestamps."""
+        self.histograms[stage].record(end_ns - start_ns, end_ns)
+
+    def snapshot(self):
+        """Counters and per-stage summaries as a plain dict."""
+        return {
+            "timestamp": time.time(),
+            "uptime_s": time.time() - self.started,
+            "counters": {name: getattr(self, name) for name in COUNTERS},
+            "latency": {stage: h.summary() for stage, h in self.histograms.items()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_csv(self, device=None, header=True):
+        """One row per stage, counters repeated on each row; device adds a leading column."""
+        snapshot = self.snapshot()
+        fields = (["stage"] + [f"p{p}_us" for p in PERCENTILES]
+                  + ["max_us", "count"] + list(COUNTERS))
+        if device is not None:
+            fields.insert(0, "device")
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=fields)
+        if header:
+            writer.writeheader()
+        for stage, summary in snapshot["latency"].items():
+            row = {"stage": stage}
+            if device is not None:
+                row["device"] = device
+            row.update(summary)
+            row.update(snapshot["counters"])
+            writer.writerow(row)
+        return out.getvalue()
+
+    def dump(self, path):
+        """Write stats to path as CSV if it ends in .csv, JSON otherwise."""
+        text = self.to_csv() if path.lower().endswith(".csv") else self.to_json()
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+"""
+KPOD to MIDI Bridge v2 - HID Transports
+Real USB HID access plus a simulated KPOD driven by a scripted event generator
+"""
+
+import struct
+import time
+from collections import deque
+
+# KPOD USB identifiers
+VENDOR_ID = 0x04d8
+PRODUCT_ID = 0xF12D
+KPOD_USB_CMD_UPDATE = ord('u')
+REPORT_LEN = 8
+
+# Rocker bits (controls >> 5) reported for each rocker position
+ROCKER_BITS = {
+    "VFO A": 0b10,
+    "VFO B": 0b00,
+    "XIT/RIT": 0b01,
+}
+
+
+class KPODTransport:
+    """
+    Base class for KPOD report transports.
+
+    A transport exchanges raw 8-byte reports with a KPOD: write() sends a
+    command packet and read() returns the reply, or b"" if none arrived
+    within read_timeout seconds.
+    """
+
+    name = "transport"
+    serial = None  # Identifies one of several KPODs, if known
+    read_timeout = 0.1  # Seconds; reads never block longer than this
+    finished = False  # True once a finite source (a replay) has nothing left
+
+    @property
+    def identity(self):
+        """Tells devices apart across reconnects."""
+        return self.serial or self.name
+
+    def is_present(self):
+        """True if the device looks connected and worth opening."""
+        return True
+
+    def open(self):
+        """Open the transport; raise on failure."""
+        raise NotImplementedError
+
+    def write(self, packet):
+        """Send one command packet."""
+        raise NotImplementedError
+
+    def read(self, size, timeout=None):
+        """Read one report of up to size bytes, waiting at most timeout (default read_timeout)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the transport."""
+
+
+class HIDTransport(KPODTransport):
+    """
+    USB HID transport for a physical KPOD.
+
+    Opens the device at path, else the one with serial, else the first
+    device matching the vendor and product IDs.
+    """
+
+    def __init__(self, vendor_id=VENDOR_ID, product_id=PRODUCT_ID, path=None, serial=None):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.path = path
+        self.serial = serial
+        self.name = f"USB HID {serial}" if serial else "USB HID"
+        self.opened_serial = None
+        self.device = None
+
+    def open(self):
+        """Open the configured HID device."""
+        import hid  # Only needed when a real device is used
+        if self.path:
+            self.device = hid.Device(path=self.path)
+        else:
+            self.device = hid.Device(self.vendor_id, self.product_id, self.serial)
+        self.device.nonblocking = False
+        try:
+            self.opened_serial = self.serial or self.device.serial
+        except Exception:
+            self.opened_serial = None
+
+    @property
+    def identity(self):
+        return self.opened_serial or self.path
+
+    def locate(self):
+        """Enumerate without opening; path of the connected device this transport means, or None."""
+        import hid
+        for info in hid.enumerate(self.vendor_id, self.product_id):
+            path = info.get("path")
+            if self.serial is not None:
+                if info.get("serial_number") != self.serial:
+                    continue
+            elif self.path is not None and path != self.path:
+                continue
+            return path
+        return None
+
+    def is_present(self):
+        path = self.locate()
+        if path is not None and self.path is not None:
+            self.path = path  # A replugged device can come back under a new path
+        return path is not None
+
+    def write(self, packet):
+        return self.device.write(packet)
+
+    def read(self, size, timeout=None):
+        if timeout is None:
+            timeout = self.read_timeout
+        return self.device.read(size, int(timeout * 1000))  # b"" on timeout
+
+    def close(self):
+        if self.device:
+            try:
+                self.device.close()
+            finally:
+                self.device = None
+
+
+class Idle:
+    """Scenario segment with no activity."""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def step(self, generator, t0, t1):
+        pass
+
+
+class EncoderSpin:
+    """Scenario segment spinning the encoder at a steady rate."""
+
+    def __init__(self, ticks_per_second, duration):
+        self.ticks_per_second = ticks_per_second  # Negative for CCW
+        self.duration = duration
+
+    def step(self, generator, t0, t1):
+        generator.add_ticks(self.ticks_per_second * (t1 - t0))
+
+
+class ButtonStorm:
+    """Scenario segment pressing buttons at a fixed rate, cycling 1-8."""
+
+    def __init__(self, presses_per_second, duration, hold_ratio=0.0, buttons=(1, 2, 3, 4, 5, 6, 7, 8)):
+        self.presses_per_second = presses_per_second
+        self.duration = duration
+        self.hold_ratio = hold_ratio
+        self.buttons = tuple(buttons)
+
+    def step(self, generator, t0, t1):
+        rate = self.presses_per_second
+        for k in range(int(t0 * rate), int(t1 * rate)):
+            button = self.buttons[k % len(self.buttons)]
+            # Deterministic spread of HOLDs across the storm
+            hold = int((k + 1) * self.hold_ratio) > int(k * self.hold_ratio)
+            generator.press(button, hold)
+
+
+class RockerFlips:
+    """Scenario segment cycling the rocker through positions at a fixed rate."""
+
+    def __init__(self, flips_per_second, duration, positions=("VFO A", "VFO B", "XIT/RIT")):
+        self.flips_per_second = flips_per_second
+        self.duration = duration
+        self.positions = tuple(positions)
+
+    def step(self, generator, t0, t1):
+        rate = self.flips_per_second
+        for k in range(int(t0 * rate), int(t1 * rate)):
+            generator.set_rocker(self.positions[k % len(self.positions)])
+
+
+class Dropout:
+    """Scenario segment with the KPOD unplugged: opens, writes and reads fail."""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def step(self, generator, t0, t1):
+        generator.unplug(self.duration - t1)
+
+
+class EventGenerator:
+    """
+    Scriptable KPOD activity source.
+
+    Runs a list of scenario segments back to back on a monotonic clock and
+    accumulates their output the way the KPOD firmware does: encoder ticks
+    add up between polls, button events queue, and the rocker is a level.
+    """
+
+    def __init__(self, segments, loop=False, clock=time.monotonic):
+        self.segments = list(segments)
+        self.loop = loop
+        self.clock = clock
+        self.total_duration = sum(s.duration for s in self.segments)
+        self.rocker = "VFO B"
+        self.reset()
+
+    def reset(self):
+        """Clear pending activity and counters."""
+        self.t_start = None
+        self.t_last = 0.0
+        self.tick_accum = 0.0
+        self.pending_ticks = 0
+        self.pending_buttons = deque()
+        self.rocker_changed = False
+        self.ticks_generated = 0
+        self.buttons_generated = 0
+        self.rocker_flips = 0
+        self.offline_until = 0.0
+
+    def start(self, now=None):
+        """Start the script timeline."""
+        self.t_start = self.clock() if now is None else now
+        self.t_last = 0.0
+
+    @property
+    def finished(self):
+        """True once a non-looping script has run past its last segment."""
+        return not self.loop and self.t_last >= self.total_duration
+
+    def add_ticks(self, ticks):
+        self.tick_accum += ticks
+        whole = int(self.tick_accum)
+        if whole:
+            self.tick_accum -= whole
+            self.pending_ticks += whole
+            self.ticks_generated += whole
+
+    def press(self, button, hold=False):
+        controls = (button & 0x0F) | (0x10 if hold else 0)
+        self.pending_buttons.append(controls)
+        self.buttons_generated += 1
+
+    def unplug(self, seconds):
+        """Take the simulated device offline for seconds from now."""
+        self.offline_until = max(self.offline_until, self.clock() + seconds)
+
+    @property
+    def offline(self):
+        return self.clock() < self.offline_until
+
+    def set_rocker(self, position):
+        if position != self.rocker:
+            self.rocker = position
+            self.rocker_changed = True
+            self.rocker_flips += 1
+
+    def advance(self, now=None):
+        """Run the script up to now."""
+        if self.t_start is None:
+            self.start(now)
+        now = self.clock() if now is None else now
+        elapsed = now - self.t_start
+        if self.total_duration <= 0:
+            return
+        while self.t_last < elapsed:
+            if self.t_last >= self.total_duration:
+                if not self.loop:
+                    return
+                # Wrap the timeline for looping scripts
+                self.t_start += self.total_duration
+                elapsed -= self.total_duration
+                self.t_last = 0.0
+                continue
+            end = min(elapsed, self.total_duration)
+            seg_start = 0.0
+            for segment in self.segments:
+                seg_end = seg_start + segment.duration
+                lo = max(self.t_last, seg_start)
+                hi = min(end, seg_end)
+                if hi > lo:
+                    segment.step(self, lo - seg_start, hi - seg_start)
+                seg_start = seg_end
+            self.t_last = end
+
+    def next_report(self):
+        """Return (ticks, controls) for the next 'u' poll, or None if idle."""
+        if not (self.pending_ticks or self.pending_buttons or self.rocker_changed):
+            return None
+        # Reports carry a signed 16-bit count; keep any overflow for later
+        ticks = max(-32768, min(32767, self.pending_ticks))
+        self.pending_ticks -= ticks
+        controls = ROCKER_BITS.get(self.rocker, 0) << 5
+        if self.pending_buttons:
+            controls |= self.pending_buttons.popleft()
+        self.rocker_changed = False
+        return ticks, controls
+
+
+def enumerate_kpods(vendor_id=VENDOR_ID, product_id=PRODUCT_ID):
+    """Return an unopened HIDTransport for every connected KPOD."""
+    import hid
+    transports = []
+    seen = set()
+    for info in hid.enumerate(vendor_id, product_id):
+        path = info.get("path")
+        if path in seen:
+            continue
+        seen.add(path)
+        transports.append(HIDTransport(vendor_id, product_id, path=path,
+                                       serial=info.get("serial_number") or None))
+    return transports
+
+
+class SimulatedKPOD(KPODTransport):
+    """
+    Simulated KPOD transport.
+
+    Answers the 'u' (update), '=' (device ID) and 'v' (firmware version)
+    commands from an EventGenerator, so the poll loop runs without hardware.
+    """
+
+    name = "simulated KPOD"
+
+    def __init__(self, generator=None, device_id="KPOD", firmware=108, response_delay=0.0,
+                 serial=None):
+        self.serial = serial
+        if serial:
+            self.name = f"simulated KPOD {serial}"
+        self.generator = generator or EventGenerator([Idle(1.0)], loop=True)
+        self.device_id = device_id
+        self.firmware = firmware
+        self.response_delay = response_delay  # Emulated USB round trip, seconds
+        self.is_open = False
+        self.reply = None
+        self.stats = {
+            "polls": 0,
+            "event_reports": 0,
+            "ticks_reported": 0,
+            "buttons_reported": 0,
+        }
+
+    def is_present(self):
+        return not self.generator.offline
+
+    def open(self):
+        if self.generator.offline:
+            raise IOError("simulated KPOD is unplugged")
+        if self.generator.t_start is None:
+            self.generator.start()  # A reopen continues the script
+        self.is_open = True
+
+    def write(self, packet):
+        if not self.is_open:
+            raise IOError("simulated KPOD is not open")
+        cmd = packet[0]
+        reply = bytearray(REPORT_LEN)
+        if cmd == KPOD_USB_CMD_UPDATE:
+            self.stats["polls"] += 1
+            self.generator.advance()
+            if self.generator.offline:
+                self.is_open = False
+                raise IOError("simulated KPOD unplugged")
+            event = self.generator.next_report()
+            if event is not None:
+                ticks, controls = event
+                reply[0] = KPOD_USB_CMD_UPDATE
+                reply[1:3] = struct.pack("<h", ticks)
+                reply[3] = controls
+                self.stats["event_reports"] += 1
+                self.stats["ticks_reported"] += ticks
+                if controls & 0x0F:
+                    self.stats["buttons_reported"] += 1
+        elif cmd == ord('='):
+            reply[0] = cmd
+            ident = self.device_id.encode("ascii")[:REPORT_LEN - 1]
+            reply[1:1 + len(ident)] = ident
+        elif cmd == ord('v'):
+            reply[0] = cmd
+            reply[1:3] = struct.pack("<h", self.firmware)
+        self.reply = bytes(reply)
+        return len(packet)
+
+    def read(self, size, timeout=None):
+        if not self.is_open:
+            raise IOError("simulated KPOD is not open")
+        if self.response_delay:
+            time.sleep(self.response_delay)
+        reply, self.reply = self.reply, None
+        if reply is None:
+            reply = bytes(REPORT_LEN)
+        return reply[:size]
+
+    def close(self):
+        self.is_open = False
+
+
+def build_scenario(name, ticks_per_second=50.0, duration=10.0):
+    """Return the segment list for a named load scenario."""
+    if name == "idle":
+        return [Idle(duration)]
+    if name == "tuning":
+        return [EncoderSpin(ticks_per_second / 10, duration / 2),
+                EncoderSpin(-ticks_per_second / 10, duration / 2)]
+    if name == "spin":
+        return [EncoderSpin(ticks_per_second, duration)]
+    if name == "storm":
+        return [ButtonStorm(20, duration, hold_ratio=0.25)]
+    if name == "rocker":
+        return [RockerFlips(5, duration)]
+    if name == "mixed":
+        return [Idle(duration / 5),
+                EncoderSpin(ticks_per_second, duration / 5),
+                RockerFlips(5, duration / 5),
+                ButtonStorm(20, duration / 5, hold_ratio=0.25),
+                EncoderSpin(-ticks_per_second, duration / 5)]
+    if name == "dropout":
+        # A cable bump mid-spin, with the rocker moved away from VFO B first
+        return [RockerFlips(10, duration * 0.1, positions=("VFO A",)),
+                EncoderSpin(ticks_per_second, duration * 0.4),
+                Dropout(duration * 0.1),
+                EncoderSpin(ticks_per_second, duration * 0.4)]
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+SCENARIOS = ("idle", "tuning", "spin", "storm", "rocker", "mixed", "dropout")